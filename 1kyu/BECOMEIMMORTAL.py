@@ -1,29 +1,137 @@
+# Subproblems are memoized while their larger side is below this. Chains of different
+# queries practically only meet once they get this small, larger entries would just pile up.
+MEMO_MAX_SIDE = 1 << 6
+
+
 def larger_pow(x):
-    t = 1
-    while t < x:
-        t <<= 1
-    return t
+    return 1 << (x - 1).bit_length() if x > 1 else 1
 
 def range_sum(l, r):
     return (l + r) * (r - l + 1) // 2
 
 def elder_age(m,n,l,t):
-    if m == 0 or n == 0:
-        return 0
-    if m > n:
-        m, n = n, m
-    lm, ln = larger_pow(m), larger_pow(n)
-    if l > ln:
-        return 0
-
-    if lm == ln:
-        return (range_sum(1, ln - l - 1) * (m + n - ln) + elder_age(ln - n, lm - m, l, t)) % t
-    
-    if lm < ln:
-        lm = ln // 2
-        tmp = range_sum(1, ln - l - 1) * m - (ln - n) * range_sum(max(0, lm - l), ln - l - 1)
-        if l <= lm:
-            tmp += (lm - l) * (lm - m) * (ln - n) + elder_age(lm - m, ln - n, 0, t)
+    return _elder_sum(m, n, l) % t
+
+def elder_age_many(queries):
+    """Evaluates every (m, n, l, t) query, sharing one memo table across this batch only."""
+    memo = {}
+    return [_elder_sum(m, n, l, memo) % t for m, n, l, t in queries]
+
+def _elder_sum(m, n, l, memo=None):
+    """
+    Exact sum of max(0, (x ^ y) - l) over the m x n grid.
+
+    Every rectangle reduces to a closed-form term plus at most one smaller rectangle,
+    so the recursion is unrolled into a loop over that chain of subproblems.
+    Exact sums of the small ones are kept in `memo`, keyed by the normalized (m, n, l).
+    """
+    chain = []  # (key, term) for every subproblem visited on the way down, key None if too large
+    tail = 0
+    while True:
+        if m == 0 or n == 0:
+            break
+        if m > n:
+            m, n = n, m
+        key = None
+        if memo is not None and n < MEMO_MAX_SIDE:
+            key = (m, n, l)
+            if key in memo:
+                tail = memo[key]
+                break
+
+        lm, ln = larger_pow(m), larger_pow(n)
+        if l > ln:
+            break
+
+        if lm == ln:
+            term = range_sum(1, ln - l - 1) * (m + n - ln)
+            m, n = ln - n, lm - m
         else:
-            tmp += elder_age(lm - m, ln - n, l - lm, t)
-        return tmp % t
\ No newline at end of file
+            lm = ln // 2
+            term = range_sum(1, ln - l - 1) * m - (ln - n) * range_sum(max(0, lm - l), ln - l - 1)
+            if l <= lm:
+                term += (lm - l) * (lm - m) * (ln - n)
+                l = 0
+            else:
+                l -= lm
+            m, n = lm - m, ln - n
+        chain.append((key, term))
+
+    # Walk back up, storing the value of every subproblem of the chain
+    total = tail
+    for key, term in reversed(chain):
+        total += term
+        if key is not None:
+            memo[key] = total
+    return total
+
+
+# --- Verification & Benchmarks ---
+
+def _reference_elder_age(m, n, l, t):
+    """Brute-force sum over the grid, only usable for small m, n."""
+    return sum(max(0, (x ^ y) - l) for x in range(m) for y in range(n)) % t
+
+def _edge_values(rng, limit):
+    """Sizes around powers of two, where the reduction switches branches."""
+    p = 1 << rng.randint(0, max(0, limit.bit_length() - 1))
+    return min(limit, max(0, p + rng.choice((-1, 0, 1, 0, rng.randint(-p // 2, p // 2)))))
+
+def _fuzz(rounds=2000, seed=0, small=64):
+    """
+    Randomized differential test against the brute-force reference on small grids,
+    covering power-of-two boundaries, l above the next power of two and m == n.
+    The same queries are also run as one batch through the memo of elder_age_many, and
+    large inputs are checked for agreement between single queries and a batch.
+    Raises AssertionError with the failing query.
+    """
+    import random
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(rounds):
+        m = _edge_values(rng, small)
+        n = m if rng.random() < 0.2 else _edge_values(rng, small)
+        top = larger_pow(max(m, n))
+        l = rng.choice((0, rng.randint(0, top), top - 1, top, top + 1, 2 * top + rng.randint(0, 5)))
+        t = rng.choice((1, 2, 7, 10 ** 9 + 7, rng.randint(1, 1 << 40)))
+        query = (m, n, l, t)
+        assert elder_age(*query) == _reference_elder_age(*query), query
+        queries.append(query)
+    for query, batched in zip(queries, elder_age_many(queries)):
+        assert batched == _reference_elder_age(*query), query
+
+    queries = []
+    for _ in range(rounds):
+        bits = rng.randint(1, 62)
+        m, n = rng.getrandbits(bits), rng.getrandbits(bits)
+        l = rng.choice((0, rng.getrandbits(bits), larger_pow(max(m, n)) + 1))
+        queries.append((m, n, l, rng.randint(1, 1 << 40)))
+    single = [elder_age(*query) for query in queries]
+    for query, a, b in zip(queries, single, elder_age_many(queries)):
+        assert a == b, query
+
+def _benchmark(queries_per_size=5000, seed=0, exponents=range(10, 61, 10)):
+    """Prints queries per second for input magnitudes 2^10 .. 2^60, one by one and as a batch."""
+    import random
+    from time import perf_counter
+    rng = random.Random(seed)
+    for e in exponents:
+        queries = [
+            (rng.getrandbits(e), rng.getrandbits(e), rng.getrandbits(e - 4), rng.randint(1, 1 << 32))
+            for _ in range(queries_per_size)
+        ]
+        start = perf_counter()
+        for query in queries:
+            elder_age(*query)
+        single = perf_counter() - start
+        start = perf_counter()
+        elder_age_many(queries)
+        batch = perf_counter() - start
+        print('2^{:<3} single {:>12,.0f} q/s   batch {:>12,.0f} q/s'.format(
+            e, queries_per_size / single, queries_per_size / batch))
+
+
+if __name__ == '__main__':
+    _fuzz()
+    print('fuzz: ok')
+    _benchmark()
@@ -1,125 +1,418 @@
+import os
+import re
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 USE_BREAK_DISPLAY = True
 
-def break_evil_pieces(shape):
+_SPACE, _PLUS, _DASH, _PIPE = (ord(ch) for ch in ' +-|')
+# Pieces whose bounding box is smaller than this are cheaper to render without NumPy
+NP_MIN_PIECE_AREA = 400
+# Below this many pieces the process pool costs more than it saves
+PARALLEL_MIN_PIECES = 2000
+
+_EMPTY_RUN = re.compile(rb'\x01+')
+_WALL = re.compile(rb'\x00')
+_NON_SPACE = re.compile(rb'[^ ]')
+_ONE = re.compile(rb'\x01')
+_CHUNK_SIZE = 1 << 16
+# Expanded characters -> padded cell kinds: 1 = empty space, 0 = wall
+_CELL_KINDS = bytes(int(i == _SPACE) for i in range(256))
+_HORZ_KINDS = bytes(int(i in (_PLUS, _DASH)) for i in range(256))
+_VERT_KINDS = bytes(int(i in (_PLUS, _PIPE)) for i in range(256))
+
+def break_evil_pieces(shape, workers=None):
+    """
+    Returns the closed pieces of the diagram.
+    With `workers`, diagrams with at least PARALLEL_MIN_PIECES pieces are rendered by a
+    process pool of that size; the pieces keep the order of the single-process path.
+    """
     if not shape.strip():
         return []
+    if np is not None:
+        return _break_pieces_np(shape, workers)
 
     # Interpolate (expand) the shape to handle shared walls
     total_rows, total_cols, expanded_grid = _expand_shape(shape)
 
-    # Identify all empty space coordinates in the expanded grid
-    empty_spaces = {
-        (r, c) 
-        for r in range(total_rows) 
-        for c in range(total_cols) 
-        if expanded_grid[r][c] == ' '
-    }
-    
+    # Label every connected region of empty spaces in one pass over a flat grid
+    width = total_cols + 2
+    cells = _padded_cells(total_rows, total_cols, expanded_grid)
+    _, regions = _label_regions(cells, width)
+
+    if _use_pool(workers, regions):
+        return _render_parallel([
+            _slice_task(_grid_slice(expanded_grid, bbox), boundary_cells, bbox, width)
+            for boundary_cells, outside, bbox in regions
+            if not outside
+        ], workers)
+
     found_regions = []
-    
-    # Process each connected region of empty spaces
-    while empty_spaces:
-        # Start a flood fill from an arbitrary empty space
-        start_node = empty_spaces.pop()
-        current_region = {start_node}
-        frontier = {start_node}
-        
-        # Iterative BFS to find all connected empty spaces
-        while frontier:
-            next_frontier = set()
-            for node in frontier:
-                # Find valid empty neighbors that haven't been processed
-                neighbors = _get_cardinal_neighbors(node) & empty_spaces
-                next_frontier.update(neighbors)
-            
-            # Update main sets
-            next_frontier -= current_region
-            current_region.update(next_frontier)
-            frontier = next_frontier
-            
-        # Remove the processed region from the global set of empty spaces
-        empty_spaces -= current_region
-
-        # Calculate the boundary (walls) of this region.
-        # The boundary consists of non-empty cells adjacent to the region.
-        boundary_cells = set()
-        for node in current_region:
-            boundary_cells.update(_get_neighbors_8(node))
-        boundary_cells -= current_region
-
-        # Calculate bounding box
-        r_coords = [r for r, c in boundary_cells]
-        c_coords = [c for r, c in boundary_cells]
-        
-        min_r, max_r = min(r_coords), max(r_coords) + 1
-        min_c, max_c = min(c_coords), max(c_coords) + 1
 
+    for boundary_cells, outside, bbox in regions:
         # Filter out the "outside" background region.
-        # If the boundary indices are negative or exceed dimensions, 
-        # it means this region touches the edge of the canvas (the outside world).
-        if min_r < 0 or min_c < 0 or max_r > total_rows or max_c > total_cols:
+        # If the region touches the edge of the canvas, it is the outside world.
+        if outside:
             continue
+        min_r, max_r, min_c, max_c = bbox
 
         # Extract the shape within the bounding box
         shape_matrix = [
-            list(row[min_c:max_c]) 
+            list(row[min_c:max_c])
             for row in expanded_grid[min_r:max_r]
         ]
+        found_regions.append(_render_piece(shape_matrix, boundary_cells, min_r, min_c, width))
+
+    return found_regions
+
+
+def _render_piece(shape_matrix, boundary_cells, min_r, min_c, width):
+    """
+    Cleans the bounding box of one piece in place and returns the de-interpolated piece.
+    boundary_cells are flat indices into the padded grid of the given width.
+    """
+    # Clean up the shape: remove artifacts not part of this specific boundary
+    for r in range(len(shape_matrix)):
+        # Flat index of the row start in the padded grid
+        base = (r + min_r + 1) * width + min_c + 1
+        for c in range(len(shape_matrix[r])):
+            pos = base + c
+
+            # If a cell is not empty but not part of our specific boundary, wipe it
+            if shape_matrix[r][c] != ' ' and pos not in boundary_cells:
+                shape_matrix[r][c] = ' '
+
+            # Fix intersections ('+') on the boundary
+            # If a '+' doesn't connect both ways within THIS boundary, it becomes a simple line
+            elif shape_matrix[r][c] == '+':
+                has_horz = pos - 1 in boundary_cells or pos + 1 in boundary_cells
+                has_vert = pos - width in boundary_cells or pos + width in boundary_cells
+
+                if not (has_horz and has_vert):
+                    shape_matrix[r][c] = '-' if has_horz else '|'
+
+    # De-interpolate: Scale down by taking every 2nd character
+    collapsed_shape = []
+    for row in shape_matrix[::2]:
+        line = "".join(row[::2]).rstrip()
+        collapsed_shape.append(line)
+
+    return '\n'.join(collapsed_shape)
+
+
+def _use_pool(workers, regions):
+    """Whether the pieces are worth a process pool: only with workers and many pieces."""
+    if workers is None or workers <= 1:
+        return False
+    return sum(1 for _, outside, _ in regions if not outside) >= PARALLEL_MIN_PIECES
+
+
+def _render_parallel(tasks, workers):
+    """Renders the slice tasks (see _slice_task) in a process pool, in task order."""
+    with ProcessPoolExecutor(workers) as pool:
+        # map() yields in submission order, so the output matches the serial path
+        return list(pool.map(_render_slice, tasks, chunksize=max(1, len(tasks) // (4 * workers))))
+
+
+def _grid_slice(expanded_grid, bbox):
+    """Characters of the bbox of the list-of-lists grid, as flat ascii bytes."""
+    min_r, max_r, min_c, max_c = bbox
+    return ''.join(''.join(row[min_c:max_c]) for row in expanded_grid[min_r:max_r]).encode('ascii')
 
-        # Clean up the shape: remove artifacts not part of this specific boundary
-        for r in range(len(shape_matrix)):
-            for c in range(len(shape_matrix[r])):
-                global_pos = (r + min_r, c + min_c)
-                
-                # If a cell is not empty but not part of our specific boundary, wipe it
-                if shape_matrix[r][c] != ' ' and global_pos not in boundary_cells:
-                    shape_matrix[r][c] = ' '
-                
-                # Fix intersections ('+') on the boundary
-                # If a '+' doesn't connect both ways within THIS boundary, it becomes a simple line
-                elif shape_matrix[r][c] == '+':
-                    has_horz = bool(_get_horizontal_neighbors(global_pos) & boundary_cells)
-                    has_vert = bool(_get_vertical_neighbors(global_pos) & boundary_cells)
-                    
-                    if not (has_horz and has_vert):
-                        shape_matrix[r][c] = '-' if has_horz else '|'
 
-        # De-interpolate: Scale down by taking every 2nd character
-        collapsed_shape = []
-        for row in shape_matrix[::2]:
-            line = "".join(row[::2]).rstrip()
-            collapsed_shape.append(line)
-            
-        found_regions.append('\n'.join(collapsed_shape))
+def _slice_task(chars, boundary_cells, bbox, width):
+    """
+    What a worker needs for one piece: the flat characters of its bounding box and a
+    mask of the same size with 1 on the cells of its boundary (flat padded indices).
+    """
+    min_r, max_r, min_c, max_c = bbox
+    cols = max_c - min_c
+    mask = bytearray(len(chars))
+    for pos in boundary_cells:
+        r, c = divmod(pos, width)
+        mask[(r - 1 - min_r) * cols + c - 1 - min_c] = 1
+    return chars, bytes(mask), cols
+
+
+def _render_slice(task):
+    """Worker side of _render_parallel, same cleanup as _render_piece on a flat slice."""
+    chars, mask, cols = task
+    size = len(chars)
+    piece = bytearray(b' ') * size
+
+    for m in _ONE.finditer(mask):
+        pos = m.start()
+        ch = chars[pos]
+        if ch == _PLUS:
+            c = pos % cols
+            has_horz = (c > 0 and mask[pos - 1]) or (c + 1 < cols and mask[pos + 1])
+            has_vert = (pos >= cols and mask[pos - cols]) or (pos + cols < size and mask[pos + cols])
+            if not (has_horz and has_vert):
+                ch = _DASH if has_horz else _PIPE
+        piece[pos] = ch
+
+    # De-interpolate: Scale down by taking every 2nd character
+    return '\n'.join(
+        piece[r:r + cols:2].decode('ascii').rstrip()
+        for r in range(0, size, 2 * cols)
+    )
+
+
+def _break_pieces_np(shape, workers=None):
+    """Same pipeline as break_evil_pieces on NumPy uint8 character arrays."""
+    lines = _shape_lines(shape)
+    if not lines:
+        return []
+
+    grid = _expand_shape_np(lines)
+    total_rows, total_cols = grid.shape
+    width = total_cols + 2
+
+    # 1 = empty space, 0 = wall, 2 = padding around the canvas
+    padded = np.full((total_rows + 2, width), 2, dtype=np.uint8)
+    padded[1:-1, 1:-1] = grid == _SPACE
+    # Small pieces are rendered from their boundary cells, large ones by dilation below
+    labels, regions = _label_regions(bytearray(padded.tobytes()), width, NP_MIN_PIECE_AREA)
+    labels = np.frombuffer(labels, dtype=np.intc).reshape(padded.shape)
+    chars = np.pad(grid, 1, constant_values=_SPACE)
+
+    if _use_pool(workers, regions):
+        tasks = []
+        for label, (boundary_cells, outside, bbox) in enumerate(regions, 1):
+            if outside:
+                continue
+            min_r, max_r, min_c, max_c = bbox
+            if boundary_cells is None:
+                # Large piece: boundary mask by dilation, as in _render_piece_np
+                window = (slice(min_r + 1, max_r + 1), slice(min_c + 1, max_c + 1))
+                mask = _boundary_np(labels[window] == label)
+                tasks.append((chars[window].tobytes(), mask.astype(np.uint8).tobytes(), max_c - min_c))
+            else:
+                tasks.append(_slice_task(grid[min_r:max_r, min_c:max_c].tobytes(), boundary_cells, bbox, width))
+        return _render_parallel(tasks, workers)
+
+    found_regions = []
+    for label, (boundary_cells, outside, bbox) in enumerate(regions, 1):
+        if outside:
+            continue
+        min_r, max_r, min_c, max_c = bbox
+
+        if (max_r - min_r) * (max_c - min_c) < NP_MIN_PIECE_AREA:
+            shape_matrix = [
+                list(row.tobytes().decode('ascii'))
+                for row in grid[min_r:max_r, min_c:max_c]
+            ]
+            found_regions.append(_render_piece(shape_matrix, boundary_cells, min_r, min_c, width))
+            continue
+
+        # The bounding box of the boundary, shifted into padded coordinates
+        window = (slice(min_r + 1, max_r + 1), slice(min_c + 1, max_c + 1))
+        piece = _render_piece_np(chars[window], labels[window] == label)
+        found_regions.append('\n'.join(
+            row.tobytes().decode('ascii').rstrip() for row in piece
+        ))
 
     return found_regions
 
 
-# --- Helper Functions ---
+def _render_piece_np(chars, mask):
+    """
+    Cleans one piece given the characters of its bounding box and the mask of its region,
+    and returns the de-interpolated character array.
+    """
+    boundary = _boundary_np(mask)
 
-def _expand_shape(s):
+    # Anything that is not part of this specific boundary is wiped
+    piece = np.where(boundary, chars, _SPACE).astype(np.uint8)
+
+    # A '+' that doesn't connect both ways within THIS boundary becomes a simple line
+    b = np.pad(boundary, 1)
+    has_horz = b[1:-1, :-2] | b[1:-1, 2:]
+    has_vert = b[:-2, 1:-1] | b[2:, 1:-1]
+    lonely = (piece == _PLUS) & ~(has_horz & has_vert)
+    piece[lonely & has_horz] = _DASH
+    piece[lonely & ~has_horz] = _PIPE
+
+    # De-interpolate: Scale down by taking every 2nd character
+    return piece[::2, ::2]
+
+
+def _boundary_np(mask):
+    """Boundary = 8-neighbour dilation of the region, minus the region itself."""
+    m = np.pad(mask, 1)
+    dilated = np.zeros_like(mask)
+    for dr in (0, 1, 2):
+        for dc in (0, 1, 2):
+            dilated |= m[dr:dr + mask.shape[0], dc:dc + mask.shape[1]]
+    return dilated & ~mask
+
+
+def iter_evil_pieces(source):
     """
-    Interpolates the shape string into a 2x grid to turn "thin" walls 
-    into explicit cells. Returns (new_rows, new_cols, new_grid_matrix).
+    Streaming variant of break_evil_pieces for diagrams too large to hold in memory.
+
+    `source` is a file path or a bytes-like buffer (bytes, memoryview, mmap). The source is
+    read twice: once to find the trimmed extent and width of the diagram, once to label it
+    row by row. Only three expanded rows plus the boundaries of the pieces still open are
+    kept alive, and every piece is yielded as soon as the last row of its region is read,
+    so pieces come out ordered by their bottom row rather than as break_evil_pieces lists them.
     """
+    first, last, width = _scan_source(source)
+    if first is None:
+        return
+    lines = islice(_source_lines(source), first, last + 1)
+    yield from _stream_pieces(_expanded_rows(lines, width), 2 * width - 1, 2 * (last - first) + 1)
+
+
+class _Region:
+    """Union-find node of a region that is labeled while the diagram streams by."""
+
+    __slots__ = ('parent', 'outside', 'boundary', 'min_r', 'max_r', 'min_c', 'max_c')
+
+    def __init__(self, r, c):
+        self.parent = None
+        self.outside = False
+        # (r, c) -> character of every wall 8-adjacent to the region
+        self.boundary = {}
+        self.min_r = self.max_r = r
+        self.min_c = self.max_c = c
+
+    def find(self):
+        root = self
+        while root.parent is not None:
+            root = root.parent
+        node = self
+        while node.parent is not None and node.parent is not root:
+            node.parent, node = root, node.parent
+        return root
+
+    def union(self, other):
+        a, b = self.find(), other.find()
+        if a is b:
+            return a
+        if len(a.boundary) < len(b.boundary):
+            a, b = b, a
+        b.parent = a
+        a.outside |= b.outside
+        if a.outside:
+            # The background is never rendered, its walls need not be kept
+            a.boundary = {}
+        else:
+            a.boundary.update(b.boundary)
+        b.boundary = None
+        a.min_r, a.max_r = min(a.min_r, b.min_r), max(a.max_r, b.max_r)
+        a.min_c, a.max_c = min(a.min_c, b.min_c), max(a.max_c, b.max_c)
+        return a
+
+    def render(self):
+        """Same cleanup as _render_piece, from the stored boundary characters alone."""
+        boundary = self.boundary
+        min_r, min_c = self.min_r - 1, self.min_c - 1
+        shape_matrix = [[' '] * (self.max_c - self.min_c + 3) for _ in range(self.max_r - self.min_r + 3)]
+        for (r, c), ch in boundary.items():
+            if ch == '+':
+                has_horz = (r, c - 1) in boundary or (r, c + 1) in boundary
+                has_vert = (r - 1, c) in boundary or (r + 1, c) in boundary
+                if not (has_horz and has_vert):
+                    ch = '-' if has_horz else '|'
+            shape_matrix[r - min_r][c - min_c] = ch
+        return '\n'.join("".join(row[::2]).rstrip() for row in shape_matrix[::2])
+
+
+def _stream_pieces(rows, total_cols, total_rows):
+    """Labels the expanded rows one by one and yields every closed piece once it is complete."""
+    prev_runs = []  # (start, end, region) of the runs of the previous row, padded columns
+    above = None
+    current = next(rows)
+
+    for r in range(total_rows):
+        below = next(rows) if r + 1 < total_rows else None
+        cells = b'\x02' + current.translate(_CELL_KINDS) + b'\x02'
+        runs = []
+        j = 0
+
+        for match in _EMPTY_RUN.finditer(cells):
+            start, end = match.span()
+            # Merge with the overlapping runs of the row above
+            while j < len(prev_runs) and prev_runs[j][1] <= start:
+                j += 1
+            region = None
+            k = j
+            while k < len(prev_runs) and prev_runs[k][0] < end:
+                other = prev_runs[k][2]
+                region = other.find() if region is None else region.union(other)
+                k += 1
+            if region is None:
+                region = _Region(r, start - 1)
+
+            # Unpadded columns [lo, hi) of the run
+            lo, hi = start - 1, end - 1
+            region.max_r = r
+            region.min_c, region.max_c = min(region.min_c, lo), max(region.max_c, hi - 1)
+            if above is None or below is None or lo == 0 or hi == total_cols:
+                region.outside = True
+                region.boundary = {}
+            elif not region.outside:
+                boundary = region.boundary
+                boundary[r, lo - 1] = chr(current[lo - 1])
+                boundary[r, hi] = chr(current[hi])
+                for row_r, row in ((r - 1, above), (r + 1, below)):
+                    for m in _NON_SPACE.finditer(row, lo - 1, hi + 1):
+                        boundary[row_r, m.start()] = chr(row[m.start()])
+            runs.append((start, end, region))
+
+        # Regions of the previous row that did not continue into this one are complete
+        active = {id(region.find()) for _, _, region in runs}
+        done = set()
+        for _, _, region in prev_runs:
+            root = region.find()
+            if id(root) in active or id(root) in done:
+                continue
+            done.add(id(root))
+            if not root.outside:
+                yield root.render()
+
+        prev_runs = runs
+        above, current = current, below
+    # Regions still open at the last row touch the bottom edge, they are all outside
+
+
+# --- Helper Functions ---
+
+def _shape_lines(s):
+    """Splits the shape into lines, trims empty lines around it and pads them to one width."""
     lines = s.split('\n')
-    
+
     # Trim leading/trailing empty lines
     while lines and not lines[0].strip():
         lines.pop(0)
     while lines and not lines[-1].strip():
         lines.pop()
-        
+
     if not lines:
-        return 0, 0, []
+        return []
 
-    original_height = len(lines)
+    # Pad lines to uniform length
     original_width = max(len(line) for line in lines)
+    return [line.ljust(original_width) for line in lines]
 
-    # Pad lines to uniform length
-    for i in range(original_height):
-        lines[i] = lines[i].ljust(original_width)
-    
+def _expand_shape(s):
+    """
+    Interpolates the shape string into a 2x grid to turn "thin" walls 
+    into explicit cells. Returns (new_rows, new_cols, new_grid_matrix).
+    """
+    lines = _shape_lines(s)
+    if not lines:
+        return 0, 0, []
+
+    original_height = len(lines)
+    original_width = len(lines[0])
     # Calculate new dimensions
     new_height = 2 * original_height - 1
     new_width = 2 * original_width - 1
@@ -154,18 +447,220 @@ def _expand_shape(s):
                     
     return new_height, new_width, expanded_grid
 
-def _get_cardinal_neighbors(pos):
-    r, c = pos
-    return {(r + 1, c), (r - 1, c), (r, c + 1), (r, c - 1)}
+def _expand_shape_np(lines):
+    """_expand_shape on a uint8 character array, built from shifted-slice comparisons."""
+    height, width = len(lines), len(lines[0])
+    orig = np.frombuffer(''.join(lines).encode('ascii'), dtype=np.uint8).reshape(height, width)
+    grid = np.full((2 * height - 1, 2 * width - 1), _SPACE, dtype=np.uint8)
+
+    # Original characters on even cells
+    grid[::2, ::2] = orig
+    # Horizontal connections between two of '+-' side by side
+    horz = (orig == _PLUS) | (orig == _DASH)
+    grid[::2, 1::2][horz[:, :-1] & horz[:, 1:]] = _DASH
+    # Vertical connections between two of '+|' on top of each other
+    vert = (orig == _PLUS) | (orig == _PIPE)
+    grid[1::2, ::2][vert[:-1] & vert[1:]] = _PIPE
+    return grid
+
+def _padded_cells(total_rows, total_cols, expanded_grid):
+    """Flat bytearray of the grid padded by one cell: 1 = empty space, 0 = wall, 2 = padding."""
+    width = total_cols + 2
+    cells = bytearray([2]) * (width * (total_rows + 2))
+    for r, row in enumerate(expanded_grid):
+        base = (r + 1) * width + 1
+        cells[base:base + total_cols] = bytes(ch == ' ' for ch in row)
+    return cells
+
+def _label_regions(cells, width, max_area=None):
+    """
+    Connected-component labeling of the empty spaces of a flat, padded grid (see _padded_cells).
+
+    Works on horizontal runs of empty cells rather than single cells: runs are found with a
+    regex over the bytes, and runs of consecutive rows that overlap are merged with union-find.
+
+    Returns (labels, regions): labels is an array('i') where labels[i] is the 1-based region
+    of flat index i (0 for walls and the padding), and every region is a tuple
+    (boundary_cells, outside, bbox). boundary_cells holds the flat indices of the walls
+    8-adjacent to the region, outside tells whether the region reaches the edge of the canvas,
+    and bbox = (min_r, max_r, min_c, max_c) is the bounding box of the boundary in unpadded
+    coordinates (max exclusive). Boundaries are only collected for regions that are not
+    outside and, with max_area, whose bbox is smaller than that; the others get None.
+    """
+    height = len(cells) // width
+    runs = [m.span() for m in _EMPTY_RUN.finditer(cells)]
+    parent = list(range(len(runs)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    # Merge every run with the overlapping runs of the row above
+    prev_lo = prev_hi = row_lo = 0
+    row = -1
+    j = 0
+    for i, (start, end) in enumerate(runs):
+        r = start // width
+        if r != row:
+            prev_lo, prev_hi = (row_lo, i) if r == row + 1 else (i, i)
+            row, row_lo, j = r, i, prev_lo
+        # Skip runs above that end before this one starts
+        while j < prev_hi and runs[j][1] + width <= start:
+            j += 1
+        k = j
+        while k < prev_hi and runs[k][0] + width < end:
+            a, b = find(i), find(k)
+            if a != b:
+                # The earliest run stays the root, so regions keep scanline order
+                parent[max(a, b)] = min(a, b)
+            k += 1
+
+    labels = array('i', [0]) * len(cells)
+    regions = []
+    region_of_root = {}
+    region_of_run = []
+    for i, (start, end) in enumerate(runs):
+        root = find(i)
+        if root == i:
+            region_of_root[i] = len(regions)
+            # [boundary, outside, first, last, min_c, max_c]
+            regions.append([None, False, start, end - 1, width, 0])
+        region_of_run.append(region_of_root[root])
+        region = regions[region_of_root[root]]
+        label = region_of_root[root] + 1
+        labels[start:end] = array('i', [label]) * (end - start)
+
+        region[3] = end - 1
+        region[4] = min(region[4], start % width)
+        region[5] = max(region[5], (end - 1) % width)
+        r = start // width
+        if r == 1 or r == height - 2 or cells[start - 1] == 2 or cells[end] == 2:
+            region[1] = True
+
+    # The boundary wraps the region's cells by exactly one cell on every side
+    bboxes = [
+        (first // width - 2, last // width + 1, min_c - 2, max_c + 1)
+        for _, _, first, last, min_c, max_c in regions
+    ]
+    for region, (min_r, max_r, min_c, max_c) in zip(regions, bboxes):
+        if not region[1] and (max_area is None or (max_r - min_r) * (max_c - min_c) < max_area):
+            region[0] = set()
+
+    for (start, end), index in zip(runs, region_of_run):
+        boundary = regions[index][0]
+        if boundary is None:
+            continue
+        # Walls right before / after the run and along the rows above and below it
+        if cells[start - 1] == 0:
+            boundary.add(start - 1)
+        if cells[end] == 0:
+            boundary.add(end)
+        for offset in (-width, width):
+            for m in _WALL.finditer(cells, start - 1 + offset, end + 1 + offset):
+                boundary.add(m.start())
+
+    return labels, [(region[0], region[1], bbox) for region, bbox in zip(regions, bboxes)]
+
+def _source_lines(source):
+    """Yields the raw lines (bytes, without the newline) of a file path or a bytes-like buffer."""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            for line in f:
+                yield line.rstrip(b'\n')
+        return
+
+    if hasattr(source, 'find'):
+        # bytes, bytearray and mmap can be searched in place
+        pos, size = 0, len(source)
+        while pos < size:
+            end = source.find(b'\n', pos)
+            if end == -1:
+                end = size
+            yield bytes(source[pos:end])
+            pos = end + 1
+        return
+
+    # Other buffers (memoryview, array) are split one chunk at a time
+    view = memoryview(source).cast('B')
+    pending = b''
+    for pos in range(0, len(view), _CHUNK_SIZE):
+        *complete, pending = (pending + bytes(view[pos:pos + _CHUNK_SIZE])).split(b'\n')
+        yield from complete
+    if pending:
+        yield pending
+
+def _scan_source(source):
+    """First pass: (first, last) non-blank line indices and the padded width between them."""
+    first = last = None
+    width = running = 0
+    for i, line in enumerate(_source_lines(source)):
+        if first is not None:
+            running = max(running, len(line))
+        if line.strip():
+            if first is None:
+                first = i
+                running = len(line)
+            last, width = i, running
+    return first, last, width
+
+def _expanded_rows(lines, width):
+    """Yields the rows of the expanded grid (see _expand_shape) as bytearrays, one at a time."""
+    total_cols = 2 * width - 1
+    previous = None
+    for line in lines:
+        line = line.ljust(width)
+        if previous is not None:
+            # Vertical connections between two of '+|' on top of each other
+            row = bytearray(b' ') * total_cols
+            both = (
+                int.from_bytes(previous.translate(_VERT_KINDS), 'big')
+                & int.from_bytes(line.translate(_VERT_KINDS), 'big')
+            ).to_bytes(width, 'big')
+            for m in _ONE.finditer(both):
+                row[2 * m.start()] = _PIPE
+            yield row
+
+        # Original characters and horizontal connections between two of '+-'
+        row = bytearray(b' ') * total_cols
+        row[::2] = line
+        horz = line.translate(_HORZ_KINDS)
+        for m in _EMPTY_RUN.finditer(horz):
+            start, end = m.span()
+            row[2 * start + 1:2 * end - 1:2] = b'-' * (end - start - 1)
+        yield row
+        previous = line
+
+
+# --- Verification ---
+
+def _cell_rows(cols, rows, closed=True):
+    """
+    Diagram of `rows` stacked rows of `cols` cells. Without `closed` the cells are ∩-shaped
+    and open into an empty line that reaches both edges, so they all belong to the outside.
+    """
+    wall = '+' + '--+' * cols
+    inner = '|' + '  |' * cols
+    if closed:
+        return '\n'.join([wall] + [inner, wall] * rows)
+    return '\n'.join(' ' + line for _ in range(rows) for line in (wall, inner, ''))
 
-def _get_neighbors_8(pos):
-    r, c = pos
-    return {(r + i, c + j) for i in (-1, 0, 1) for j in (-1, 0, 1) if not (i == 0 and j == 0)}
+def _check_stream_memory(cols=50, heights=(100, 400, 1600)):
+    """iter_evil_pieces must keep its peak memory flat when only the height of a diagram grows."""
+    import tracemalloc
+    for closed in (True, False):
+        peaks = []
+        for rows in heights:
+            source = _cell_rows(cols, rows, closed).encode()
+            tracemalloc.start()
+            count = sum(1 for _ in iter_evil_pieces(source))
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            assert count == (cols * rows if closed else 0), count
+        print('closed' if closed else 'open  ', ' '.join('{:>8,} B'.format(p) for p in peaks))
+        assert peaks[-1] < 2 * peaks[0], peaks
 
-def _get_vertical_neighbors(pos):
-    r, c = pos
-    return {(r + 1, c), (r - 1, c)}
 
-def _get_horizontal_neighbors(pos):
-    r, c = pos
-    return {(r, c + 1), (r, c - 1)}
+if __name__ == '__main__':
+    _check_stream_memory()
@@ -1,4 +1,7 @@
+import abc
+import collections
 import functools
+import heapq
 import itertools
 
 try:
@@ -11,12 +14,19 @@ except NameError:
 
 class Query:
     def __init__(self):
-        self._data = []
+        self._tables = ()
+        self._joins = []
         self._where_clauses = []
         self._having_clauses = []
         self._group_by_funcs = []
+        self._presorted = False
+        self._aggregates = []
         self._select_func = None
         self._order_by_func = None
+        self._order_key = None
+        self._order_reverse = False
+        self._limit = None
+        self._offset = 0
         
         self._has_from = False
         self._has_select = False
@@ -34,87 +44,279 @@ class Query:
         if self._has_from:
             raise DuplicateFromError
         self._has_from = True
-        
-        if len(args) == 0:
-            self._data = []
-        elif len(args) == 1:
-            self._data = args[0]
-        else:
-            self._data = [list(x) for x in itertools.product(*args)]
+        # Rows are only produced when the query runs, see _rows
+        self._tables = args
+        return self
+
+    def join_on(self, left_key, right_key):
+        """
+        Equi-joins the next table of from_ to the tables before it: left_key gets the
+        joined row so far (a list with one item per table), right_key an item of the next
+        table. Chained calls join the following tables in turn, tables without a join_on
+        are crossed with the result as before. Rows come out in no particular order.
+        """
+        self._joins.append((left_key, right_key))
         return self
 
     def where(self, *funcs):
         self._where_clauses.append(funcs)
         return self
 
-    def group_by(self, *funcs):
+    def group_by(self, *funcs, presorted=False):
+        """
+        With presorted=True the rows must already arrive ordered by the grouping keys;
+        groups of the first key are then built and emitted one run at a time.
+        """
         if self._has_group_by:
             raise DuplicateGroupByError
         self._has_group_by = True
         self._group_by_funcs = list(funcs)
+        self._presorted = presorted
+        return self
+
+    def aggregate(self, *aggregates):
+        """
+        Replaces the rows of every group by the values of the given aggregates (Count(),
+        Sum(f), ...), computed while grouping so no rows are kept. Without group_by the
+        query returns a single row with the aggregates over all rows.
+        """
+        self._aggregates = list(aggregates)
         return self
 
     def having(self, *funcs):
         self._having_clauses.append(funcs)
         return self
 
-    def order_by(self, func):
+    def order_by(self, func=None, key=None, reverse=False):
+        """
+        Orders by a comparator func(a, b), or by key(row) like sorted(); both are stable.
+        A key is cheaper: it is called once per row instead of once per comparison.
+        """
         if self._has_order_by:
             raise DuplicateOrderByError
         self._has_order_by = True
         self._order_by_func = func
+        self._order_key = functools.cmp_to_key(func) if func is not None else key
+        self._order_reverse = reverse
+        return self
+
+    def limit(self, n):
+        self._limit = n
+        return self
+
+    def offset(self, k):
+        self._offset = k
         return self
 
+    def _rows(self):
+        """The rows of the from clause; several tables give their product, one row at a time."""
+        tables = self._tables
+        if not tables:
+            return iter(())
+        if len(self._joins) >= len(tables):
+            raise ValueError('join_on needs one more table in from_ per join')
+        if len(tables) == 1:
+            return iter(tables[0])
+        if not self._joins:
+            return (list(x) for x in itertools.product(*tables))
+
+        rows = ([item] for item in tables[0])
+        left_size = _size(tables[0])
+        for table, (left_key, right_key) in zip(tables[1:], self._joins):
+            rows = _hash_join(rows, left_size, table, left_key, right_key)
+            left_size = None  # Unknown until the join has run
+
+        rest = tables[len(self._joins) + 1:]
+        if rest:
+            rows = (row + list(x) for row in rows for x in itertools.product(*rest))
+        return rows
+
     def _apply_filters(self, data, clauses):
-        result = []
+        # Every clause is an OR of its functions, clauses are ANDed together
         for item in data:
-            keep_item = True
-            for clause_group in clauses:
-                if not any(f(item) for f in clause_group):
-                    keep_item = False
-                    break
-            if keep_item:
-                result.append(item)
-        return result
+            if all(any(f(item) for f in clause_group) for clause_group in clauses):
+                yield item
 
     def _apply_grouping(self, data, group_funcs):
         if not group_funcs:
-            return data
-        
-        current_func = group_funcs[0]
-        groups = {}
-        
+            return self._group_value(data)
+
+        # Single pass: nested dicts down to the last key, whose values are the groups
+        root = {}
+        *outer_funcs, last_func = group_funcs
+        aggregates = self._aggregates
         for item in data:
-            key = current_func(item)
-            if key not in groups:
-                groups[key] = []
-            groups[key].append(item)
-            
-        result = []
-        for key, subgroup in groups.items():
-            result.append([key, self._apply_grouping(subgroup, group_funcs[1:])])
-            
-        return result
+            node = root
+            for func in outer_funcs:
+                key = func(item)
+                child = node.get(key)
+                if child is None:
+                    child = node[key] = {}
+                node = child
 
-    def execute(self):
-        result = list(self._data)
+            key = last_func(item)
+            group = node.get(key)
+            if group is None:
+                group = node[key] = [agg.start() for agg in aggregates] if aggregates else []
+            if aggregates:
+                for i, agg in enumerate(aggregates):
+                    group[i] = agg.add(group[i], item)
+            else:
+                group.append(item)
+
+        return self._nested_groups(root, len(group_funcs))
+
+    def _nested_groups(self, node, depth):
+        if depth == 1:
+            return [[key, self._group_result(group)] for key, group in node.items()]
+        return [[key, self._nested_groups(child, depth - 1)] for key, child in node.items()]
+
+    def _group_result(self, group):
+        """A finished group: its rows, or the results of the aggregates."""
+        if self._aggregates:
+            return [agg.result(state) for agg, state in zip(self._aggregates, group)]
+        return group
+
+    def _group_value(self, items):
+        """The group value of all the given rows at once."""
+        if not self._aggregates:
+            return list(items)
+        states = [agg.start() for agg in self._aggregates]
+        for item in items:
+            for i, agg in enumerate(self._aggregates):
+                states[i] = agg.add(states[i], item)
+        return self._group_result(states)
+
+    def _stream_grouping(self, data, group_funcs):
+        """Groups input ordered by the keys, one run of equal first keys at a time."""
+        first_func, *inner_funcs = group_funcs
+        for key, run in itertools.groupby(data, first_func):
+            yield [key, self._apply_grouping(run, inner_funcs)]
+
+    def iterate(self):
+        """
+        Runs the query as a chain of generators. Rows flow one at a time through from,
+        where, having and select; only group_by and order_by need all of their input
+        at once and buffer it. Once a limit is reached, or the caller stops consuming, the
+        remaining rows, including the rest of a multi-table product, are never built.
+        """
+        result = self._rows()
 
         if self._where_clauses:
             result = self._apply_filters(result, self._where_clauses)
 
-        if self._group_by_funcs:
-            result = self._apply_grouping(result, self._group_by_funcs)
+        if self._group_by_funcs and self._presorted:
+            result = self._stream_grouping(result, self._group_by_funcs)
+        elif self._group_by_funcs:
+            result = iter(self._apply_grouping(result, self._group_by_funcs))
+        elif self._aggregates:
+            result = iter([self._group_value(result)])
 
         if self._having_clauses:
             result = self._apply_filters(result, self._having_clauses)
 
         if self._select_func:
-            result = [self._select_func(item) for item in result]
+            result = map(self._select_func, result)
+
+        stop = None if self._limit is None else self._offset + self._limit
+        if self._order_key is not None:
+            result = self._apply_ordering(result, stop)
 
-        if self._order_by_func:
-            result.sort(key=functools.cmp_to_key(self._order_by_func))
+        if self._offset or stop is not None:
+            result = itertools.islice(result, self._offset, stop)
 
         return result
 
+    def _apply_ordering(self, data, stop):
+        # With a limit only the first rows are needed: a heap keeps them in O(n log stop)
+        if stop is not None:
+            select = heapq.nlargest if self._order_reverse else heapq.nsmallest
+            return iter(select(stop, data, key=self._order_key))
+        return iter(sorted(data, key=self._order_key, reverse=self._order_reverse))
+
+    def execute(self):
+        return list(self.iterate())
+
 def query():
-    return Query()
\ No newline at end of file
+    return Query()
+
+# --- Aggregates ---
+
+class Aggregate(abc.ABC):
+    """Incremental aggregate: start() gives the empty state, add() folds in one row."""
+
+    def __init__(self, func=None):
+        self.func = func
+
+    def start(self):
+        return None
+
+    @abc.abstractmethod
+    def add(self, state, item):
+        """Returns the state with one more row folded in."""
+
+    def result(self, state):
+        return state
+
+class Count(Aggregate):
+    def start(self):
+        return 0
+
+    def add(self, state, item):
+        return state + 1
+
+class Sum(Aggregate):
+    def start(self):
+        return 0
+
+    def add(self, state, item):
+        return state + self.func(item)
+
+class Min(Aggregate):
+    def add(self, state, item):
+        value = self.func(item)
+        return value if state is None or value < state else state
+
+class Max(Aggregate):
+    def add(self, state, item):
+        value = self.func(item)
+        return value if state is None or value > state else state
+
+class Avg(Aggregate):
+    def start(self):
+        return (0, 0)
+
+    def add(self, state, item):
+        return (state[0] + self.func(item), state[1] + 1)
+
+    def result(self, state):
+        return state[0] / state[1] if state[1] else None
+
+def _hash_join(rows, left_size, table, left_key, right_key):
+    """
+    Joins every row with the items of table that have an equal key. The hash table is
+    built on the smaller side when both sizes are known, otherwise on the table, and
+    the other side is streamed through it.
+    """
+    right_size = _size(table)
+    if left_size is not None and right_size is not None and left_size < right_size:
+        index = collections.defaultdict(list)
+        for row in rows:
+            index[left_key(row)].append(row)
+        for item in table:
+            for row in index.get(right_key(item), ()):
+                yield row + [item]
+    else:
+        index = collections.defaultdict(list)
+        for item in table:
+            index[right_key(item)].append(item)
+        for row in rows:
+            for item in index.get(left_key(row), ()):
+                yield row + [item]
+
+def _size(table):
+    """len(table), or None for iterables without one."""
+    try:
+        return len(table)
+    except TypeError:
+        return None
\ No newline at end of file
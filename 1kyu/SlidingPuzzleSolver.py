@@ -1,278 +1,983 @@
-import numpy as np
-import queue
-
-def slide_puzzle(array):
+import os
+import random
+import struct
+import tempfile
+import time
+import zlib
+# Aliased: `array` is the name of the board argument below
+from array import array as _array
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from functools import lru_cache
+from heapq import heappop, heappush
+from math import factorial
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Largest board side searched by IDA* in optimal mode
+OPTIMAL_MAX_SIDE = 4
+# Seconds of IDA* before falling back to the reduction. About a third of random 4x4 boards
+# are solved within 2 s, and few more until 10 s, so a longer default mostly waits longer.
+OPTIMAL_TIME_BUDGET = 2.0
+# Largest board side whose steps are shortened by default, larger boards gain only 1-2%
+OPTIMIZE_MAX_SIDE = 20
+
+def slide_puzzle(array, optimal=False, time_budget=OPTIMAL_TIME_BUDGET, optimize=None):
+    """
+    With `optimal`, boards up to OPTIMAL_MAX_SIDE are searched for a shortest solution
+    for at most `time_budget` seconds (None = no limit) before falling back to the reduction.
+    With `optimize`, the reduction's steps are shortened afterwards (see _optimize_steps);
+    None does so for boards up to OPTIMIZE_MAX_SIDE.
+    """
     game = SlidingPuzzle(array)
-    game.solve()
+    game.solve(optimal, time_budget, optimize)
     return game.steps
 
 
+def slide_puzzle_many(boards, workers=None, **options):
+    """
+    Lazily yields (index, slide_puzzle(board, **options)) for every board.
+
+    With workers > 1 the boards are spread over a process pool and results are yielded
+    as they complete, not in input order. Only a few boards per worker are read ahead
+    of the results being consumed.
+    """
+    if not workers or workers <= 1:
+        for index, board in enumerate(boards):
+            yield index, slide_puzzle(board, **options)
+        return
+
+    with ProcessPoolExecutor(workers) as pool:
+        pending = {}
+        try:
+            for index, board in enumerate(boards):
+                pending[pool.submit(slide_puzzle, board, **options)] = index
+                if len(pending) >= 4 * workers:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield pending.pop(future), future.result()
+            for future in as_completed(list(pending)):
+                yield pending.pop(future), future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def warm_up(shapes=((OPTIMAL_MAX_SIDE, OPTIMAL_MAX_SIDE),)):
+    """
+    Loads or builds the cached tables ahead of the first solves: the endgame table, and the
+    pattern databases of every (height, width) board shape in `shapes` for optimal mode.
+    Until those exist, optimal mode with a time budget goes straight to the reduction.
+    """
+    _endgame_table(ENDGAME_SIDE)
+    for height, width in shapes:
+        if ENDGAME_SIDE < max(height, width) <= OPTIMAL_MAX_SIDE:
+            _pattern_databases(height, width)
+
+
 class Tile:
-    def __init__(self, value, r, c):
+    """Read-only snapshot of one cell, see SlidingPuzzle.grid."""
+
+    def __init__(self, value, r, c, is_locked=False):
         self.value = value
         self.r = r  # Row index
         self.c = c  # Column index
-        self.is_locked = False
-        self.neighbors = []
-        
-        # A* Pathfinding attributes
-        self.distance_from_start = np.inf
-        self.parent_tile = None
+        self.is_locked = is_locked
 
     def __repr__(self):
         return str(self.value)
 
-    def __gt__(self, other):
-        # Required for PriorityQueue comparison
-        return self.distance_from_start > other.distance_from_start
-
-    def reset_pathfinding(self):
-        self.distance_from_start = np.inf
-        self.parent_tile = None
-
     def manhattan_distance(self, other):
         return abs(self.r - other.r) + abs(self.c - other.c)
 
-    def swap_values(self, other):
-        """Swaps value and lock status with another tile (physically moving the tile)."""
-        self.value, other.value = other.value, self.value
-        self.is_locked, other.is_locked = other.is_locked, self.is_locked
-
-    def compute_neighbors(self, grid):
-        """Pre-calculates valid neighbors for this position."""
-        height, width = grid.shape
-        self.neighbors = []
-        if self.r > 0:          self.neighbors.append(grid[self.r - 1, self.c])
-        if self.r < height - 1: self.neighbors.append(grid[self.r + 1, self.c])
-        if self.c > 0:          self.neighbors.append(grid[self.r, self.c - 1])
-        if self.c < width - 1:  self.neighbors.append(grid[self.r, self.c + 1])
-
-    def get_best_neighbor(self, target_dest):
-        """Finds the neighbor closest to the target destination (heuristic)."""
-        candidates = [
-            (target_dest.manhattan_distance(n), n) 
-            for n in self.neighbors if not n.is_locked
-        ]
-        if not candidates:
-            return None
-        # Sort by distance, return the tile
-        return sorted(candidates, key=lambda x: x[0])[0][1]
-
 
 class SlidingPuzzle:
+    """
+    The board is kept as flat cell ids (r * width + c):
+    `values` holds the value of every cell, `positions` the cell of every value
+    and `locked` marks the cells that are already solved.
+    """
+
     def __init__(self, array):
-        # Initialize grid
-        self.grid = np.array(array, dtype=object)
-        self.height, self.width = self.grid.shape
+        self.height, self.width = len(array), len(array[0])
+        size = self.height * self.width
         self.steps = []
-        
+
+        self.values = _flat_values(array)
+        self.positions = _array('i', [0]) * size
+        for cell, val in enumerate(self.values):
+            if 0 <= val < size:  # Anything else is rejected by is_solvable
+                self.positions[val] = cell
+        self.locked = bytearray(size)
+
         # Determine the "Solved" state (1 to N-1, then 0)
-        self.target_grid = np.zeros_like(self.grid, dtype=int)
-        
-        for r, row in enumerate(self.grid):
-            for c, val in enumerate(row):
-                # Create Tile objects
-                self.grid[r, c] = Tile(val, r, c)
-                # Calculate expected value at this position
-                self.target_grid[r, c] = 1 + c + self.width * r
-        
-        # Set the last cell target to 0 (empty space)
-        self.target_grid[-1, -1] = 0
+        self.target = list(range(1, size)) + [0]
 
         # Link neighbors
-        for row in self.grid:
-            for tile in row:
-                tile.compute_neighbors(self.grid)
-
-    def _reset_tiles(self):
-        """Clears A* data on all tiles."""
-        for tile in np.ravel(self.grid):
-            tile.reset_pathfinding()
-
-    def _find_tile_by_value(self, value):
-        """Scan grid to find the tile object containing a specific value."""
-        for row in self.grid:
-            for tile in row:
-                if tile.value == value:
-                    return tile
-        return None
+        self.neighbors = [self._compute_neighbors(cell) for cell in range(size)]
+        self.pathfinder = _BlankPathfinder(self.width, self.neighbors)
+
+    @property
+    def grid(self):
+        """Tile view of the current board, an object NumPy array when NumPy is available."""
+        rows = [
+            [
+                Tile(self.values[r * self.width + c], r, c, bool(self.locked[r * self.width + c]))
+                for c in range(self.width)
+            ]
+            for r in range(self.height)
+        ]
+        if np is None:
+            return rows
+        grid = np.empty((self.height, self.width), dtype=object)
+        for r, row in enumerate(rows):
+            for c, tile in enumerate(row):
+                grid[r, c] = tile
+        return grid
+
+    def _compute_neighbors(self, cell):
+        """Pre-calculates valid neighbors for this position."""
+        r, c = divmod(cell, self.width)
+        neighbors = []
+        if r > 0:               neighbors.append(cell - self.width)
+        if r < self.height - 1: neighbors.append(cell + self.width)
+        if c > 0:               neighbors.append(cell - 1)
+        if c < self.width - 1:  neighbors.append(cell + 1)
+        return tuple(neighbors)
+
+    def _manhattan_distance(self, a, b):
+        ar, ac = divmod(a, self.width)
+        br, bc = divmod(b, self.width)
+        return abs(ar - br) + abs(ac - bc)
+
+    def _swap(self, a, b):
+        """Swaps value and lock status of two cells (physically moving the tile)."""
+        values, positions, locked = self.values, self.positions, self.locked
+        values[a], values[b] = values[b], values[a]
+        positions[values[a]] = a
+        positions[values[b]] = b
+        locked[a], locked[b] = locked[b], locked[a]
+
+    def _best_neighbor(self, cell, target_dest):
+        """Finds the neighbor closest to the target destination (heuristic)."""
+        candidates = [
+            (self._manhattan_distance(target_dest, n), n)
+            for n in self.neighbors[cell] if not self.locked[n]
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda x: x[0])[1]
 
-    def solve(self):
+    def is_solvable(self):
+        """
+        Parity check: every move swaps the blank with a neighbor, so the parity of the
+        permutation (counted through its cycles) always equals the parity of the blank's
+        distance from its home cell.
+        """
+        size = len(self.values)
+        if sorted(self.values) != list(range(size)):
+            return False
+
+        # Permutation cell -> home cell of the value in it
+        home = [(val - 1) % size for val in self.values]
+        seen = bytearray(size)
+        cycles = 0
+        for cell in range(size):
+            if not seen[cell]:
+                cycles += 1
+                while not seen[cell]:
+                    seen[cell] = 1
+                    cell = home[cell]
+
+        return (size - cycles) % 2 == self._manhattan_distance(self.positions[0], size - 1) % 2
+
+    def solve(self, optimal=False, time_budget=OPTIMAL_TIME_BUDGET, optimize=None):
         """Main solver pipeline."""
+        if not self.is_solvable():
+            self.steps = None
+            return
+
+        # Boards up to the endgame square are already solved optimally by the table
+        if optimal and ENDGAME_SIDE < max(self.height, self.width) <= OPTIMAL_MAX_SIDE:
+            steps = _solve_optimal(self.values, self.height, self.width, time_budget)
+            if steps is not None:
+                for val in steps:
+                    self._swap(self.positions[0], self.positions[val])
+                self.steps = steps
+                return
+
+        initial_values = _array('i', self.values)
         self._reduce_grid()
-        self._solve_remaining_3x3()
+        self._solve_endgame()
+
+        if optimize is None:
+            optimize = max(self.height, self.width) <= OPTIMIZE_MAX_SIDE
+        if optimize and self.steps:
+            self.steps = _optimize_steps(initial_values, self.width, self.steps)
 
     def _reduce_grid(self):
         """
-        Solves the top row, then the left column, iteratively reducing the 
+        Solves the top row, then the left column, iteratively reducing the
         unsolved area until only a 3x3 (or effectively smaller) grid remains.
         """
-        # We stop when 2 rows/cols remain (creating a 3x3 zone at bottom-right)
-        for i in range(self.height - 2):
-            
+        w = self.width
+
+        # We stop when 3 rows/cols remain (the 3x3 zone at bottom-right is left to the table)
+        for i in range(self.height - ENDGAME_SIDE):
+
             # 1. Solve the top-most unsolved Row
             # Identify the "buffer" zone (next two rows) used to juggle tiles
+            row = range(i * w, (i + 1) * w)
             row_buffer = (
-                self.grid[i + 1, -1], self.grid[i + 1, -2],
-                self.grid[i + 2, -1], self.grid[i + 2, -2]
+                (i + 2) * w - 1, (i + 2) * w - 2,
+                (i + 3) * w - 1, (i + 3) * w - 2
             )
             # Solve the row using the buffer
-            self._solve_vector(self.grid[i, :], self.target_grid[i, :], row_buffer)
+            self._solve_vector(row, row_buffer)
 
             # 2. Solve the left-most unsolved Column
+            last = (self.height - 1) * w
+            column = range((i + 1) * w + i, last + i + 1, w)
             col_buffer = (
-                self.grid[-1, i + 1], self.grid[-2, i + 1],
-                self.grid[-1, i + 2], self.grid[-2, i + 2]
+                last + i + 1, last - w + i + 1,
+                last + i + 2, last - w + i + 2
             )
             # Solve the column using the buffer
-            self._solve_vector(self.grid[i + 1:, i], self.target_grid[i + 1:, i], col_buffer)
+            self._solve_vector(column, col_buffer)
 
-    def _solve_vector(self, tiles, solutions, buffer_zone):
+    def _solve_vector(self, cells, buffer_zone):
         """
         Generic method to solve a single Row or Column.
         strategies differ for the normal elements vs the final two elements.
         """
+        solutions = [self.target[cell] for cell in cells]
+
         # 1. Place all tiles except the last two
-        for tile, correct_val in zip(tiles[:-2], solutions[:-2]):
-            self._move_value_to_target(tile, correct_val)
+        for cell, correct_val in zip(cells[:-2], solutions[:-2]):
+            self._move_value_to_target(cell, correct_val)
 
         # 2. Complex shuffle to place the last two tiles of the line
         # We utilize the buffer zone (adjacent rows/cols) to rotate tiles in.
-        
+
         # Move pieces out of the way into buffer (temporarily unlocked)
         self._move_value_to_target(buffer_zone[2], solutions[-1], lock_result=False)
         self._move_value_to_target(buffer_zone[3], solutions[-2], lock_result=False)
-        self._move_value_to_target(tiles[-1], solutions[-2], lock_result=False)
+        self._move_value_to_target(cells[-1], solutions[-2], lock_result=False)
         self._move_value_to_target(buffer_zone[0], solutions[-1], lock_result=False)
 
         # Special check: Ensure the empty space (0) isn't blocking the critical spot
-        if tiles[-2] != self._find_tile_by_value(0):
+        if cells[-2] != self.positions[0]:
             # Move buffer tile out of the way, ignoring specific tiles to prevent deadlock
             self._move_value_to_target(
-                buffer_zone[1], 
-                tiles[-2].value, 
-                ignore_list=[buffer_zone[0], tiles[-1]], 
+                buffer_zone[1],
+                self.values[cells[-2]],
+                ignore_list=[buffer_zone[0], cells[-1]],
                 lock_result=False
             )
 
         # Final placement of the last two tiles
-        self._move_value_to_target(tiles[-2], solutions[-2])
-        self._move_value_to_target(tiles[-1], solutions[-1])
+        self._move_value_to_target(cells[-2], solutions[-2])
+        self._move_value_to_target(cells[-1], solutions[-1])
 
     def _move_value_to_target(self, target_pos, value_to_fetch, ignore_list=None, lock_result=True):
         """
-        Moves a specific value (value_to_fetch) into a specific physical tile (target_pos).
+        Moves a specific value (value_to_fetch) into a specific cell (target_pos).
         Uses A* pathfinding.
         """
         ignore_list = ignore_list or []
+        values, positions = self.values, self.positions
 
-        while target_pos.value != value_to_fetch:
-            zero_tile = self._find_tile_by_value(0)
-            target_tile = self._find_tile_by_value(value_to_fetch)
+        while values[target_pos] != value_to_fetch:
+            zero_cell = positions[0]
+            target_cell = positions[value_to_fetch]
 
             # Determine where the zero tile should go to help move the target
             # We want '0' to be adjacent to our target tile, on the side closest to destination
-            best_spot_for_zero = target_tile.get_best_neighbor(target_pos)
+            best_spot_for_zero = self._best_neighbor(target_cell, target_pos)
 
             # Find path for '0' to that spot
-            path = self._calculate_astar_path(zero_tile, best_spot_for_zero, avoid_tile=target_tile, ignore_list=ignore_list)
+            path = self._calculate_astar_path(zero_cell, best_spot_for_zero, avoid_cell=target_cell, ignore_list=ignore_list)
 
             # Execute the movement of '0'
-            for current, next_tile in zip(path, path[1:]):
-                self.steps.append(next_tile.value)
-                current.swap_values(next_tile)
-            else:
-                # Finally, swap '0' with the target number to advance it one step
-                self.steps.append(target_tile.value)
-                path[-1].swap_values(target_tile)
+            for current, next_cell in zip(path, path[1:]):
+                self.steps.append(values[next_cell])
+                self._swap(current, next_cell)
 
-        if lock_result:
-            target_pos.is_locked = True
-
-    def _calculate_astar_path(self, start_node, end_node, avoid_tile, ignore_list):
-        """Standard A* implementation to move the empty space (0)."""
-        pq = queue.PriorityQueue()
-        self._reset_tiles()
-        
-        start_node.distance_from_start = 0
-        pq.put((0, start_node))
+            # Finally, swap '0' with the target number to advance it one step
+            self.steps.append(value_to_fetch)
+            self._swap(path[-1], target_cell)
 
-        while not pq.empty():
-            _, current = pq.get()
+        if lock_result:
+            self.locked[target_pos] = 1
+
+    def _calculate_astar_path(self, start_node, end_node, avoid_cell, ignore_list):
+        """A* path for the empty space (0), never through locked, avoided or ignored cells."""
+        # The avoided and ignored cells are blocked only for the duration of this search
+        locked = self.locked
+        extra = [cell for cell in (avoid_cell, *ignore_list) if not locked[cell]]
+        for cell in extra:
+            locked[cell] = 1
+        try:
+            return self.pathfinder.path(start_node, end_node, locked)
+        finally:
+            for cell in extra:
+                locked[cell] = 0
+
+    def _solve_endgame(self):
+        """Finishes the unsolved bottom-right square with optimal moves from the endgame table."""
+        side = min(ENDGAME_SIDE, self.height, self.width)
+        w = self.width
+        area = [r * w + c for r in range(self.height - side, self.height) for c in range(w - side, w)]
+        # Local label of every value = local cell it belongs in, the blank is the last one
+        label = {self.target[cell]: i for i, cell in enumerate(area)}
+        if any(self.values[cell] not in label for cell in area):
+            self.steps = None  # The reduction left tiles of other rows or columns in the square
+            return
+        state = [label[self.values[cell]] for cell in area]
+        table = _endgame_table(side)
+        offsets = (-side, side, -1, 1)
+
+        while True:
+            move = table[_rank(state)]
+            if move == _SOLVED:
+                return
+            if not move:
+                self.steps = None  # Only reachable with tiles outside the square unsolved
+                return
+            blank = state.index(len(state) - 1)
+            other = blank + offsets[move - 1]
+            state[blank], state[other] = state[other], state[blank]
+            self.steps.append(self.values[area[other]])
+            self._swap(area[blank], area[other])
+
+
+# --- Endgame Table ---
+
+# Directory of the precomputed tables that are cached between runs
+CACHE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Bumped whenever the layout of a cached table changes, older files are rebuilt
+CACHE_VERSION = 1
+# Cache file header: magic, CACHE_VERSION, table size and CRC-32 of the table
+_CACHE_HEADER = struct.Struct('<4sHQI')
+_CACHE_MAGIC = b'SPST'
+
+# Side of the square left to the table by _reduce_grid
+ENDGAME_SIDE = 3
+# Where the 3x3 table is cached between runs
+ENDGAME_CACHE = os.path.join(CACHE_DIR, 'SlidingPuzzleSolver.3x3.cache')
+
+# Table entries: 0 = unreachable, _SOLVED = goal, otherwise 1 + direction of the blank's next move
+_SOLVED = 255
+_endgame_tables = {}
+
+def _endgame_table(side):
+    """
+    Lazily loads the table of a side x side square: for every permutation rank, the optimal
+    next move of the blank. The 3x3 table is read from ENDGAME_CACHE, or built and saved there.
+    """
+    table = _endgame_tables.get(side)
+    if table is None:
+        build = lambda: _build_endgame_table(side)
+        size = factorial(side * side)
+        table = _cached_table(ENDGAME_CACHE, size, build) if side == 3 else build()
+        _endgame_tables[side] = table
+    return table
+
+def _build_endgame_table(side):
+    """Breadth-first search backwards from the solved square over all reachable states."""
+    cells = side * side
+    blank_label = cells - 1
+    # Blank directions: up, down, left, right; d ^ 1 is the opposite direction
+    moves = [
+        [(d, blank + offset) for d, (offset, ok) in enumerate((
+            (-side, blank >= side), (side, blank < cells - side),
+            (-1, blank % side > 0), (1, blank % side < side - 1),
+        )) if ok]
+        for blank in range(cells)
+    ]
+
+    table = bytearray(factorial(cells))
+    goal = tuple(range(cells))
+    table[_rank(goal)] = _SOLVED
+    frontier = deque([goal])
+
+    while frontier:
+        state = frontier.popleft()
+        blank = state.index(blank_label)
+        for d, other in moves[blank]:
+            nxt = list(state)
+            nxt[blank], nxt[other] = nxt[other], nxt[blank]
+            rank = _rank(nxt)
+            if not table[rank]:
+                # From nxt the blank steps back the opposite way, one move closer to the goal
+                table[rank] = 1 + (d ^ 1)
+                frontier.append(tuple(nxt))
+
+    return table
+
+
+# --- Optimal Search ---
+
+# Tiles per pattern database, consecutive tiles share one database
+PDB_GROUP_SIZE = 5
+
+_pattern_dbs = {}
+
+class _OutOfTime(Exception):
+    pass
+
+def _solve_optimal(values, height, width, time_budget):
+    """
+    IDA* for a shortest solution, as the list of moved values; None when the time budget
+    runs out. Within a budget the pattern databases are only loaded, never built: without
+    them cached (see warm_up) it gives up at once.
+    The heuristic is the larger of Manhattan distance plus linear conflicts and the sum of
+    the additive pattern databases, all updated incrementally on every move.
+    """
+    deadline = None if time_budget is None else time.monotonic() + time_budget
+    cells = height * width
+    board = list(values)
+    pos = [0] * cells
+    for cell, val in enumerate(board):
+        pos[val] = cell
+
+    row_of = [cell // width for cell in range(cells)]
+    col_of = [cell % width for cell in range(cells)]
+    dist = [[abs(row_of[a] - row_of[b]) + abs(col_of[a] - col_of[b]) for b in range(cells)] for a in range(cells)]
+    neighbors = [
+        [n for n, ok in ((c - width, c >= width), (c + width, c < cells - width),
+                         (c - 1, c % width > 0), (c + 1, c % width < width - 1)) if ok]
+        for c in range(cells)
+    ]
+
+    # Pattern databases: every tile belongs to one group, its position is one base-`cells` digit
+    databases = _pattern_databases(height, width, build=time_budget is None)
+    if databases is None:
+        return None
+    group_of = [0] * cells
+    weight_of = [0] * cells
+    for gi, (tiles, _) in enumerate(databases):
+        for k, tile in enumerate(tiles):
+            group_of[tile], weight_of[tile] = gi, cells ** k
+    tables = [table for _, table in databases]
+    index = [sum(pos[tile] * cells ** k for k, tile in enumerate(tiles)) for tiles, _ in databases]
+
+    # Tiles in their goal row (column), listed with their goal columns (rows) in board order.
+    # Lines are only ever in a few thousand distinct orders, memoize them by content.
+    row_memo = [{} for _ in range(height)]
+    col_memo = [{} for _ in range(width)]
+
+    def row_conflicts(r):
+        line = tuple(board[r * width:(r + 1) * width])
+        lc = row_memo[r].get(line)
+        if lc is None:
+            lc = row_memo[r][line] = _line_conflicts(tuple(
+                col_of[v - 1] for v in line if v and row_of[v - 1] == r
+            ))
+        return lc
+
+    def col_conflicts(c):
+        line = tuple(board[c::width])
+        lc = col_memo[c].get(line)
+        if lc is None:
+            lc = col_memo[c][line] = _line_conflicts(tuple(
+                row_of[v - 1] for v in line if v and col_of[v - 1] == c
+            ))
+        return lc
+
+    lc_rows = [row_conflicts(r) for r in range(height)]
+    lc_cols = [col_conflicts(c) for c in range(width)]
+    manhattan = sum(dist[pos[v]][v - 1] for v in range(1, cells))
+    conflicts = sum(lc_rows) + sum(lc_cols)
+    pdb = sum(table[i] for table, i in zip(tables, index))
+
+    def move(n):
+        """Slides the tile in cell n into the blank."""
+        nonlocal manhattan, conflicts, pdb
+        b = pos[0]
+        v = board[n]
+        manhattan += dist[b][v - 1] - dist[n][v - 1]
+        gi = group_of[v]
+        old = index[gi]
+        index[gi] = new = old + (b - n) * weight_of[v]
+        pdb += tables[gi][new] - tables[gi][old]
+        board[b], board[n] = v, 0
+        pos[v], pos[0] = b, n
+
+        # A vertical move only changes the contents of two rows, a horizontal one of two columns
+        if row_of[n] != row_of[b]:
+            for r in (row_of[n], row_of[b]):
+                lc = row_conflicts(r)
+                conflicts += lc - lc_rows[r]
+                lc_rows[r] = lc
+        else:
+            for c in (col_of[n], col_of[b]):
+                lc = col_conflicts(c)
+                conflicts += lc - lc_cols[c]
+                lc_cols[c] = lc
+        return v
+
+    path = []
+    nodes = 0
+
+    def search(g, bound, previous):
+        nonlocal nodes
+        h = max(manhattan + conflicts, pdb)
+        if g + h > bound:
+            return g + h
+        if not manhattan:
+            return True
+
+        nodes += 1
+        if deadline is not None and not nodes & 1023 and time.monotonic() > deadline:
+            raise _OutOfTime
+
+        minimum = None
+        blank = pos[0]
+        for n in neighbors[blank]:
+            if n == previous:
+                continue  # Never undo the last move
+            path.append(move(n))
+            t = search(g + 1, bound, blank)
+            if t is True:
+                return True
+            move(blank)
+            path.pop()
+            if minimum is None or t < minimum:
+                minimum = t
+        return minimum
+
+    bound = max(manhattan + conflicts, pdb)
+    try:
+        while True:
+            t = search(0, bound, None)
+            if t is True:
+                return path
+            bound = t
+    except _OutOfTime:
+        return None
 
-            if current == end_node:
+@lru_cache(maxsize=None)
+def _line_conflicts(goals):
+    """
+    Linear conflict of one line: two extra moves for every tile that has to leave the line so
+    that the others (given by their goal offsets in board order) are in increasing order.
+    """
+    longest = []  # Longest increasing run ending at every tile
+    for i, goal in enumerate(goals):
+        longest.append(1 + max((longest[j] for j in range(i) if goals[j] < goal), default=0))
+    return 2 * (len(goals) - max(longest, default=0))
+
+def _pattern_databases(height, width, build=True):
+    """
+    Lazily loads the additive pattern databases of a board shape as (tiles, table) pairs.
+    Tables are read from CACHE_DIR, or built and saved there; without `build`, None when
+    they are not cached.
+    """
+    key = (height, width)
+    if key not in _pattern_dbs:
+        cells = height * width
+        groups = [tuple(range(t, min(t + PDB_GROUP_SIZE, cells))) for t in range(1, cells, PDB_GROUP_SIZE)]
+        sizes = [cells ** len(tiles) for tiles in groups]
+        cache = os.path.join(CACHE_DIR, f'SlidingPuzzleSolver.pdb-{height}x{width}.cache')
+        if build:
+            data = _cached_table(cache, sum(sizes), lambda: b''.join(
+                _build_pattern_database(tiles, height, width) for tiles in groups
+            ))
+        else:
+            data = _load_table(cache, sum(sizes))
+            if data is None:
+                return None
+
+        databases = []
+        offset = 0
+        for tiles, size in zip(groups, sizes):
+            databases.append((tiles, data[offset:offset + size]))
+            offset += size
+        _pattern_dbs[key] = databases
+    return _pattern_dbs[key]
+
+def _build_pattern_database(tiles, height, width):
+    """
+    Breadth-first search over the placements of `tiles` alone. Only their own moves count
+    and the blank is not tracked, so the tables of disjoint groups can be added up.
+    """
+    cells = height * width
+    neighbors = [
+        [n for n, ok in ((c - width, c >= width), (c + width, c < cells - width),
+                         (c - 1, c % width > 0), (c + 1, c % width < width - 1)) if ok]
+        for c in range(cells)
+    ]
+    weights = [cells ** k for k in range(len(tiles))]
+
+    table = bytearray(b'\xff') * cells ** len(tiles)
+    goal = tuple(tile - 1 for tile in tiles)
+    start = sum(p * w for p, w in zip(goal, weights))
+    table[start] = 0
+    frontier = deque([(goal, start)])
+
+    while frontier:
+        placement, index = frontier.popleft()
+        moves = table[index] + 1
+        for k, p in enumerate(placement):
+            for q in neighbors[p]:
+                if q in placement:
+                    continue
+                nxt = index + (q - p) * weights[k]
+                if table[nxt] == 255:
+                    table[nxt] = moves
+                    frontier.append((placement[:k] + (q,) + placement[k + 1:], nxt))
+
+    return table
+
+
+# --- Step Optimizer ---
+
+# Blank directions: up, right, down, left. (d + 1) % 4 turns clockwise, (d + 2) % 4 reverses
+_UP, _RIGHT, _DOWN, _LEFT = range(4)
+# Longest detour looked for by _remove_cycles, the ones the reduction makes are much shorter
+_CYCLE_WINDOW = 64
+# Moves around every rewritten rotation that are checked again for cycles
+_RESCAN_MARGIN = 16
+
+def _optimize_steps(values, width, steps):
+    """
+    Shortens the steps of a solve starting from `values`, without changing the final board.
+    The steps are rewritten as blank directions, then:
+      - _remove_cycles cuts every detour that returns the board to an earlier state,
+        including a tile moved and moved straight back,
+      - _unwind_rotations replaces long runs of the blank around one 2x2 block by the
+        shorter way around,
+      - the few moves around each rewritten run are checked for cycles once more, as
+        every other state of the sequence is unchanged and still distinct.
+    The result is replayed and checked; on any mismatch the original steps are returned.
+    """
+    if width < 2:
+        return steps
+    size = len(values)
+    offsets = (-width, 1, width, -1)
+    direction_of = {offset: d for d, offset in enumerate(offsets)}
+
+    positions = [0] * size
+    for cell, val in enumerate(values):
+        positions[val] = cell
+    start = blank = positions[0]
+    directions = []
+    for val in steps:
+        cell = positions[val]
+        directions.append(direction_of[cell - blank])
+        positions[val], blank = blank, cell
+    positions[0] = blank
+    final = [0] * size
+    for val, cell in enumerate(positions):
+        final[cell] = val
+
+    rng = random.Random(size)
+    keys = [rng.getrandbits(64) for _ in range(size)]
+    directions = _remove_cycles(directions, offsets, keys, start)
+    directions, rewritten = _unwind_rotations(directions)
+    if rewritten:
+        directions = _rescan_windows(directions, offsets, keys, start, rewritten)
+
+    # Replay the directions, refusing anything that leaves the board or wraps around a row
+    board = list(values)
+    blank = start
+    optimized = []
+    for d in directions:
+        cell = blank + offsets[d]
+        if not 0 <= cell < size or (d in (_RIGHT, _LEFT) and cell // width != blank // width):
+            return steps
+        val = board[cell]
+        optimized.append(val)
+        board[blank], board[cell] = val, 0
+        blank = cell
+
+    return optimized if board == final else steps
+
+def _remove_cycles(directions, offsets, keys, blank):
+    """
+    Drops every stretch of up to _CYCLE_WINDOW moves between two visits of the same
+    board state. Only the starting cell of every piece is tracked, so states are told
+    apart by a Zobrist-style hash, sum of (origin - cell) * key[cell], that a move
+    updates in O(1).
+    """
+    mask = (1 << 64) - 1
+    origin = list(range(len(keys)))
+    state = 0
+
+    # hashes[i] = state after the first i kept moves, seen maps the recent ones back to i
+    hashes = _array('Q', [state])
+    seen = {state: 0}
+    kept = []
+    for d in directions:
+        cell = blank + offsets[d]
+        moved, here = origin[cell], origin[blank]
+        origin[blank], origin[cell] = moved, here
+        state = (state + (moved - here) * (keys[blank] - keys[cell])) & mask
+        blank = cell
+
+        visit = seen.get(state)
+        if visit is None:
+            seen[state] = len(hashes)
+            hashes.append(state)
+            kept.append(d)
+            if len(hashes) > _CYCLE_WINDOW:
+                # Kept states are all distinct, the entry can only be the old state's.
+                # It may be gone already if a cycle cut the sequence back since.
+                seen.pop(hashes[-1 - _CYCLE_WINDOW], None)
+        else:
+            # Back in an earlier state: forget everything done since
+            for old in hashes[visit + 1:]:
+                del seen[old]
+            del hashes[visit + 1:]
+            del kept[visit:]
+
+    return kept
+
+def _rescan_windows(directions, offsets, keys, blank, rewritten):
+    """Runs _remove_cycles again on the moves within _RESCAN_MARGIN of every rewritten run."""
+    windows = []
+    for start, end in rewritten:
+        start, end = max(0, start - _RESCAN_MARGIN), min(len(directions), end + _RESCAN_MARGIN)
+        if windows and start <= windows[-1][1]:
+            windows[-1][1] = end
+        else:
+            windows.append([start, end])
+
+    rescanned = []
+    done = 0
+    for start, end in windows:
+        rescanned.extend(directions[done:start])
+        blank += sum(offsets[d] for d in directions[done:start])
+        rescanned.extend(_remove_cycles(directions[start:end], offsets, keys, blank))
+        # Dropping cycles leaves the state at the end of the window unchanged
+        blank += sum(offsets[d] for d in directions[start:end])
+        done = end
+    rescanned.extend(directions[done:])
+    return rescanned
+
+def _unwind_rotations(directions):
+    """
+    A blank that keeps turning the same way circles one 2x2 block, and 12 such moves
+    restore it. A run of 7 to 11 moves is therefore replaced by 12 - run moves the
+    other way around, starting along the run's second side.
+    Returns the new directions and the (start, end) slice of every replacement in them.
+    """
+    unwound = []
+    rewritten = []
+    i, n = 0, len(directions)
+    while i < n:
+        j = i + 1
+        turn = (directions[j] - directions[i]) % 4 if j < n else 0
+        if turn not in (1, 3):
+            unwound.append(directions[i])
+            i += 1
+            continue
+        while j < n and (directions[j] - directions[j - 1]) % 4 == turn:
+            j += 1
+
+        run = j - i
+        if 7 <= run < 12:
+            d = (directions[i] + turn) % 4
+            rewritten.append((len(unwound), len(unwound) + 12 - run))
+            for _ in range(12 - run):
+                unwound.append(d)
+                d = (d - turn) % 4
+            i = j
+        else:
+            # The last move of a short run may start a run turning the other way
+            unwound.extend(directions[i:j - 1])
+            i = j - 1
+
+    return unwound, rewritten
+
+
+# --- Blank Pathfinding ---
+
+class _BlankPathfinder:
+    """
+    A* over the cell ids of one board. The scratch buffers are allocated once and
+    stamped with a search generation instead of being cleared, so a search only
+    touches the cells it actually explores.
+    """
+
+    def __init__(self, width, neighbors):
+        size = len(neighbors)
+        self.neighbors = neighbors
+        self.rows = [cell // width for cell in range(size)]
+        self.cols = [cell % width for cell in range(size)]
+        self.distance = [0] * size
+        self.parent = [0] * size
+        self.stamp = [0] * size
+        self.generation = 0
+
+    def path(self, start, end, blocked):
+        """
+        Shortest path of cells from start to end avoiding the cells set in `blocked`.
+        An unreachable end gives [end].
+        """
+        neighbors, rows, cols = self.neighbors, self.rows, self.cols
+        distance, parent, stamp = self.distance, self.parent, self.stamp
+        self.generation += 1
+        generation = self.generation
+        end_r, end_c = rows[end], cols[end]
+
+        stamp[start] = generation
+        distance[start] = 0
+        # Ties go to the closer, then the earlier discovered cell. _solve_vector relies on
+        # this order: other tie breaks can walk the blank through its temporary tiles.
+        heap = [(0, 0, 0, start)]
+        order = 0
+
+        while heap:
+            _, dist, _, current = heappop(heap)
+            if current == end:
                 break
-
-            for neighbor in current.neighbors:
-                # Constraints for valid path
-                is_traversable = (
-                    neighbor.parent_tile != current and
-                    neighbor != avoid_tile and
-                    not neighbor.is_locked and
-                    neighbor not in ignore_list
-                )
-
-                if is_traversable:
-                    new_dist = 1 + current.distance_from_start
-                    if neighbor.distance_from_start > new_dist:
-                        neighbor.distance_from_start = new_dist
-                        neighbor.parent_tile = current
-                        # Priority = Cost so far + Heuristic (Manhattan)
-                        priority = new_dist + neighbor.manhattan_distance(end_node)
-                        pq.put((priority, neighbor))
+            if dist > distance[current]:
+                continue  # Superseded by a shorter entry
+
+            new_dist = dist + 1
+            for neighbor in neighbors[current]:
+                if blocked[neighbor]:
+                    continue
+                if stamp[neighbor] != generation or distance[neighbor] > new_dist:
+                    stamp[neighbor] = generation
+                    distance[neighbor] = new_dist
+                    parent[neighbor] = current
+                    # Priority = Cost so far + Heuristic (Manhattan)
+                    order += 1
+                    priority = new_dist + abs(rows[neighbor] - end_r) + abs(cols[neighbor] - end_c)
+                    heappush(heap, (priority, new_dist, order, neighbor))
+
+        if stamp[end] != generation:
+            return [end]
 
         # Reconstruct path
-        path = []
-        node = end_node
-        while node.parent_tile:
-            path.append(node)
-            node = node.parent_tile
-        path.append(node)
-        
-        return list(reversed(path))
-
-    def _solve_remaining_3x3(self):
-        """
-        Brute force rotation for the final 3x3 grid.
-        Iterates through a fixed rotation pattern until solved.
-        """
-        # Valid rotation sequence for the '0' tile in the bottom-right 3x3 area
-        # Relative coordinates from (height, width)
-        move_sequence = [
-            (-1, -1), (-1, -2), (-2, -2), (-2, -1) # Counter-clockwise rotation?
-        ]
-        
-        # Try for a max number of iterations to prevent infinite loops
-        for i in range(24):
-            # Check if strictly the 3x3 area is solved
-            # We flatten the last 3x3, remove the last item (should be 0), and check order
-            flat_view = self.grid[-3:, -3:].ravel()
-            current_values = [t.value for t in flat_view][:-1] # Exclude last
-            if sorted(current_values) == current_values:
-                return True
+        path = [end]
+        while path[-1] != start:
+            path.append(parent[path[-1]])
+        return path[::-1]
+
+
+# --- Helper Functions ---
 
-            zero_tile = self._find_tile_by_value(0)
-            
-            # Determine which index in the sequence we should target based on 'i'
-            # The original logic used two phases (i < 12 and i >= 12) with reversed logic
-            seq_idx = i % 4
-            offset_y, offset_x = move_sequence[seq_idx]
-            
-            # Flip logic for second half of attempts (change rotation direction)
-            if i >= 12:
-                 # Reverse the sequence lookup roughly
-                 offset_y, offset_x = move_sequence[-(seq_idx + 1)]
-
-            target_y, target_x = self.height + offset_y, self.width + offset_x
-            
-            # Check if zero is already there; if not, we need to swap with neighbor
-            # In this heuristic, we actually find the neighbor AT that coordinate and swap
-            target_tile = self.grid[target_y, target_x]
-            
-            # Only swap if it's a valid neighbor of zero (sanity check)
-            if target_tile in zero_tile.neighbors:
-                self.steps.append(target_tile.value)
-                zero_tile.swap_values(target_tile)
-        
-        # If we failed to solve in 24 steps
-        self.steps = None
+def _load_table(path, size):
+    """Reads a table of `size` bytes saved by _cached_table, None if missing or invalid."""
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(_CACHE_HEADER.size)
+            table = bytearray(f.read())
+    except OSError:
+        return None
+    if len(header) != _CACHE_HEADER.size or len(table) != size:
+        return None
+    if _CACHE_HEADER.unpack(header) != (_CACHE_MAGIC, CACHE_VERSION, size, zlib.crc32(table)):
+        return None
+    return table
+
+def _cached_table(path, size, build):
+    """
+    Reads a table of `size` bytes from path, or builds it and saves it there.
+    Files with a wrong header, size or checksum are ignored and overwritten.
+    """
+    table = _load_table(path, size)
+    if table is not None:
+        return table
+
+    table = build()
+    header = _CACHE_HEADER.pack(_CACHE_MAGIC, CACHE_VERSION, size, zlib.crc32(table))
+    # Every process writes its own file: pool workers may all build the table on a cold cache
+    tmp = None
+    try:
+        fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp', dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as f:
+            f.write(header)
+            f.write(table)
+        os.replace(tmp, path)
+    except OSError:
+        # Read-only location, keep the table in memory only
+        if tmp is not None and os.path.exists(tmp):
+            os.remove(tmp)
+    return table
+
+def _rank(perm):
+    """Lehmer-code rank of a permutation of range(len(perm)), the solved order ranks 0."""
+    rank = 0
+    n = len(perm)
+    for i, p in enumerate(perm):
+        rank = rank * (n - i) + sum(q < p for q in perm[i + 1:])
+    return rank
+
+def _flat_values(rows):
+    """Flattens the board rows into a compact int array of cell values."""
+    return _array('i', (val for row in rows for val in row))
+
+
+# --- Benchmarks ---
+
+def _random_board(rng, side):
+    """Uniformly random solvable side x side board: a shuffle with its parity fixed if needed."""
+    values = list(range(side * side))
+    rng.shuffle(values)
+    board = [values[r * side:(r + 1) * side] for r in range(side)]
+    if not SlidingPuzzle(board).is_solvable():
+        # Swapping two tiles flips the permutation parity and keeps the blank in place
+        a, b = [cell for cell, val in enumerate(values) if val][:2]
+        board[a // side][a % side], board[b // side][b % side] = values[b], values[a]
+    return board
+
+def _replay(board, steps):
+    """True when the steps are legal moves that solve the board."""
+    side = len(board)
+    values = [val for row in board for val in row]
+    positions = {val: cell for cell, val in enumerate(values)}
+    for val in steps:
+        blank, cell = positions[0], positions[val]
+        if abs(cell - blank) not in (1, side) or (abs(cell - blank) == 1 and cell // side != blank // side):
+            return False
+        values[blank], values[cell] = val, 0
+        positions[0], positions[val] = cell, blank
+    return values == list(range(1, side * side)) + [0]
+
+def _benchmark(boards_per_size=3, seed=0, sides=(3, 4, 5, 8, 10, 15, 20, 30, 40, 50), workers=None):
+    """
+    Prints solve time, moves produced and peak traced memory per board size on seeded
+    random solvable boards, then the throughput of slide_puzzle_many over all of them.
+    Memory is traced on a separate solve of the first board, tracing slows solving down.
+    """
+    import tracemalloc
+    from time import perf_counter
+    rng = random.Random(seed)
+    batch = []
+
+    for side in sides:
+        boards = [_random_board(rng, side) for _ in range(boards_per_size)]
+        batch.extend(boards)
+        elapsed = moves = 0
+        for board in boards:
+            start = perf_counter()
+            steps = slide_puzzle([row[:] for row in board])
+            elapsed += perf_counter() - start
+            assert _replay(board, steps), board
+            moves += len(steps)
+
+        tracemalloc.start()
+        slide_puzzle([row[:] for row in boards[0]])
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        print('{0:>2}x{0:<2} {1:>9.3f} s/board {2:>9,.0f} moves/board {3:>9,.0f} KiB peak'.format(
+            side, elapsed / len(boards), moves / len(boards), peak / 1024))
+
+    workers = workers or os.cpu_count()
+    start = perf_counter()
+    for index, steps in slide_puzzle_many(batch, workers=workers):
+        assert _replay(batch[index], steps), batch[index]
+    print('batch of {} boards on {} workers: {:.2f} s'.format(len(batch), workers, perf_counter() - start))
+
+
+if __name__ == '__main__':
+    _benchmark()
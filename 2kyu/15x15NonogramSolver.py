@@ -1,189 +1,511 @@
-def solve(clues):
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+from multiprocessing import Event
+from time import perf_counter
+
+# Distinct (length, clues) lines kept compiled, shared by every puzzle solved in this process
+LINE_DATA_CACHE_SIZE = 1 << 12
+# Solved line states remembered per compiled line
+LINE_CACHE_SIZE = 1 << 10
+
+ROWS, COLS = 0, 1
+
+# Set in pool workers: tells a branch search that another worker already found a solution
+_cancelled = None
+
+
+def solve(clues, workers=None, parallel_depth=1, stats=None, on_guess=None):
+    """
+    Solves the puzzle and returns the grid as a tuple of row tuples (None if unsolvable).
+
+    With workers > 1 the open sub-problems found `parallel_depth` guesses below the root
+    are handed to a process pool; the first worker to find a solution wins and the
+    remaining ones are cancelled.
+
+    Pass a SolverStats instance as `stats` to have it filled in, and a callable
+    on_guess(depth, row, cells) to be told about every row hypothesis the search tries.
+    In parallel mode on_guess only sees the guesses made before the pool takes over.
+    """
     # Clues format: (column_clues, row_clues)
     col_clues, row_clues = clues
-    n_rows = len(row_clues)
-    n_cols = len(col_clues)
-
-    # --- 1. Helper to generate all valid permutations for a single line ---
-    def get_permutations(length, line_clues):
-        # Memoization cache could be added here, but usually not needed for 15x15
-        results = []
-        
-        def backtrack(index, clue_idx, current_line):
-            # Base case: All clues placed
-            if clue_idx == len(line_clues):
-                # Fill remainder with 0s
-                results.append(current_line + [0] * (length - index))
-                return
-
-            # Recursive step
-            block_len = line_clues[clue_idx]
-            
-            # Identify bounds for placing this block
-            # Minimum space needed for remaining blocks + gaps
-            remaining_blocks = line_clues[clue_idx+1:]
-            min_remaining_space = sum(remaining_blocks) + len(remaining_blocks)
-            
-            # The range of valid start positions for the current block
-            # We must leave enough room at the end for the remaining clues
-            max_start = length - min_remaining_space - block_len
-            
-            for start in range(index, max_start + 1):
-                # Create the segment: 0s (gap) + 1s (block) + 0 (mandatory separator if not last)
-                # Note: The mandatory separator 0 is handled by the next recursive call's index
-                
-                # Gap size = start - index
-                gap = [0] * (start - index)
-                block = [1] * block_len
-                
-                # Logic to add mandatory separator 0 after block if not the last block
-                next_index = start + block_len
-                if clue_idx < len(line_clues) - 1:
-                    # Must have at least one 0 after this block
-                    # We append it now effectively or force the next loop to start +1
-                    if next_index < length:
-                        backtrack(next_index + 1, clue_idx + 1, current_line + gap + block + [0])
-                else:
-                    # Last block
-                    backtrack(next_index, clue_idx + 1, current_line + gap + block)
-
-        backtrack(0, 0, [])
-        return results
-
-    # Pre-calculate all possibilities for every row and column based *only* on clues
-    # Format: rows_possibilities[i] is a list of all valid arrays (e.g. [0,1,1,0...]) for row i
-    rows_possibilities = [get_permutations(n_cols, c) for c in row_clues]
-    cols_possibilities = [get_permutations(n_rows, c) for c in col_clues]
-
-    # --- 2. The Solver (Propagation + Backtracking) ---
-    def search(r_poss, c_poss):
-        
-        # Keep iterating until no changes occur (Constraint Propagation)
-        while True:
-            changed = False
-            
-            # --- PROCESS ROWS ---
-            # For each row, find the common cells (intersection) in all remaining possibilities
-            # If a row has only 1 possibility, that IS the row.
-            # If a row has valid options [0, 1, 0] and [0, 1, 1], we know index 0 is 0 and index 1 is 1.
-            
-            # We compute the 'known' state of the grid from rows to filter columns
-            row_knowns = [] 
-            
-            for r in range(n_rows):
-                possible_rows = r_poss[r]
-                if not possible_rows: return None # Contradiction: No valid moves left
-                
-                # Optimization: If only 1 option, we know it exactly
-                if len(possible_rows) == 1:
-                    row_knowns.append(possible_rows[0])
-                    continue
-
-                # Find intersection
-                # Zip all possibilities for this row: [(0,0), (1,1), (0,1)] -> column tuples
-                # If all elements in a tuple are same, that cell is known.
-                common = []
-                for i in range(n_cols):
-                    val = possible_rows[0][i]
-                    if all(p[i] == val for p in possible_rows):
-                        common.append(val)
-                    else:
-                        common.append(-1) # Unknown
-                row_knowns.append(common)
-
-            # --- PROCESS COLUMNS ---
-            # Filter column possibilities based on what we learned from rows
-            for c in range(n_cols):
-                current_opts = c_poss[c]
-                new_opts = []
-                for opt in current_opts:
-                    # Check if this column option matches all known row cells at this column index
-                    valid = True
-                    for r in range(n_rows):
-                        known_val = row_knowns[r][c] # What rows say this cell must be
-                        if known_val != -1 and known_val != opt[r]:
-                            valid = False
-                            break
-                    if valid:
-                        new_opts.append(opt)
-                
-                if len(new_opts) < len(current_opts):
-                    c_poss[c] = new_opts
-                    changed = True
-                if not new_opts: return None # Contradiction
-
-            # Check if solved (all rows have exactly 1 option)
-            if all(len(p) == 1 for p in r_poss):
-                # Return the grid tuple
-                return tuple(tuple(p[0]) for p in r_poss)
-
-            # --- PROCESS COLUMNS (Reverse) ---
-            # Now do the same: calculate knowns from columns to filter rows
-            col_knowns = []
-            for c in range(n_cols):
-                possible_cols = c_poss[c]
-                if len(possible_cols) == 1:
-                    col_knowns.append(possible_cols[0])
-                    continue
-                
-                common = []
-                for i in range(n_rows):
-                    val = possible_cols[0][i]
-                    if all(p[i] == val for p in possible_cols):
-                        common.append(val)
-                    else:
-                        common.append(-1)
-                col_knowns.append(common)
-            
-            # Filter Row possibilities based on known column cells
-            for r in range(n_rows):
-                current_opts = r_poss[r]
-                new_opts = []
-                for opt in current_opts:
-                    valid = True
-                    for c in range(n_cols):
-                        known_val = col_knowns[c][r]
-                        if known_val != -1 and known_val != opt[c]:
-                            valid = False
-                            break
-                    if valid:
-                        new_opts.append(opt)
-                
-                if len(new_opts) < len(current_opts):
-                    r_poss[r] = new_opts
-                    changed = True
-                if not new_opts: return None
-
-            if not changed:
+    start = perf_counter()
+    solver = _Solver(col_clues, row_clues, stats, on_guess)
+    try:
+        if not workers or workers <= 1:
+            return solver.search()
+
+        branches = [
+            (col_clues, row_clues, rows_filled, rows_empty, parallel_depth, stats is not None)
+            for rows_filled, rows_empty in solver.branches(parallel_depth)
+        ]
+        if len(branches) <= 1:
+            return _first_solution(map(_search_branch, branches), stats)
+
+        cancelled = Event()
+        with ProcessPoolExecutor(min(workers, len(branches)), initializer=_init_worker, initargs=(cancelled,)) as pool:
+            futures = [pool.submit(_search_branch, branch) for branch in branches]
+            try:
+                return _first_solution((future.result() for future in as_completed(futures)), stats)
+            finally:
+                # Pending branches never start, running ones give up at their next node
+                cancelled.set()
+                for future in futures:
+                    future.cancel()
+    finally:
+        if stats is not None:
+            stats.wall_time = perf_counter() - start
+
+
+def solve_many(iterable_of_clues, workers=None):
+    """
+    Lazily yields solve(clues) for every puzzle, in input order.
+
+    With workers > 1 the puzzles are spread over a process pool; each worker keeps
+    its own compiled line cache alive across the puzzles it receives. Only a few
+    puzzles per worker are read ahead of the results being consumed.
+    """
+    if not workers or workers <= 1:
+        for clues in iterable_of_clues:
+            yield solve(clues)
+        return
+
+    with ProcessPoolExecutor(workers) as pool:
+        pending = deque()
+        try:
+            for clues in iterable_of_clues:
+                pending.append(pool.submit(solve, clues))
+                if len(pending) >= 4 * workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def _init_worker(cancelled):
+    global _cancelled
+    _cancelled = cancelled
+
+
+def _first_solution(outcomes, stats):
+    """Merges the stats of finished branches until one of them returns a solution."""
+    for result, branch_stats in outcomes:
+        if stats is not None and branch_stats is not None:
+            stats.merge(branch_stats)
+        if result is not None:
+            return result
+    return None
+
+
+def _search_branch(args):
+    """Pool worker: rebuilds the solver from a snapshot of the row masks and searches it."""
+    col_clues, row_clues, rows_filled, rows_empty, depth, with_stats = args
+    stats = SolverStats() if with_stats else None
+    solver = _Solver(col_clues, row_clues, stats)
+    solver.depth = depth
+    for r, (filled, empty) in enumerate(zip(rows_filled, rows_empty)):
+        if filled or empty:
+            solver._set_line(ROWS, r, filled, empty)
+    return solver.search(), stats
+
+
+class SolverStats:
+    """
+    Counters and phase timings (in seconds) collected by solve().
+
+    row_candidates / col_candidates hold the number of placements each line allows from its
+    clues alone; lines_solved counts line solver runs, propagation_rounds the calls to the
+    propagator, branch_nodes the row hypotheses tried and max_depth the deepest guess.
+    """
+
+    def __init__(self):
+        self.row_candidates = []
+        self.col_candidates = []
+        self.propagation_rounds = 0
+        self.lines_solved = 0
+        self.branch_nodes = 0
+        self.max_depth = 0
+        self.generation_time = 0.0
+        self.propagation_time = 0.0
+        self.guessing_time = 0.0
+        self.wall_time = 0.0
+
+    def __repr__(self):
+        return 'SolverStats({})'.format(
+            ', '.join('{}={!r}'.format(k, v) for k, v in vars(self).items())
+        )
+
+    def merge(self, other):
+        """Adds the counters of a sub-search (e.g. a pool worker) into these stats."""
+        self.propagation_rounds += other.propagation_rounds
+        self.lines_solved += other.lines_solved
+        self.branch_nodes += other.branch_nodes
+        self.max_depth = max(self.max_depth, other.max_depth)
+        self.generation_time += other.generation_time
+        self.propagation_time += other.propagation_time
+        self.guessing_time += other.guessing_time
+
+
+class _Solver:
+    """
+    Propagation + backtracking over a shared grid state.
+
+    The grid is kept twice, as a pair of bitmasks (filled, empty) per row and per column:
+    bit c of `filled` is set when cell c is known to be 1, bit c of `empty` when it is known to be 0.
+    Cells with neither bit set are still unknown. Every change is recorded on an undo trail,
+    so a failed guess is rolled back instead of copying the state.
+    """
+
+    def __init__(self, col_clues, row_clues, stats=None, on_guess=None):
+        start = perf_counter()
+        self.stats = stats
+        self.on_guess = on_guess
+        self.depth = 0
+        self.clues = (row_clues, col_clues)
+        self.lengths = (len(col_clues), len(row_clues))
+        self.lines = (
+            [_compile_line(len(col_clues), tuple(c)) for c in row_clues],
+            [_compile_line(len(row_clues), tuple(c)) for c in col_clues],
+        )
+        self.filled = ([0] * len(row_clues), [0] * len(col_clues))
+        self.empty = ([0] * len(row_clues), [0] * len(col_clues))
+        self.trail = []
+
+        # Work queue of (axis, index) lines whose crossing cells changed since they were last solved
+        self.queue = deque()
+        self.queued = ([False] * len(row_clues), [False] * len(col_clues))
+        for axis in (ROWS, COLS):
+            for i in range(len(self.clues[axis])):
+                self._enqueue(axis, i)
+
+        if stats is not None:
+            stats.row_candidates = [_count_placements(len(col_clues), c, 0, 0)[0][0] for c in row_clues]
+            stats.col_candidates = [_count_placements(len(row_clues), c, 0, 0)[0][0] for c in col_clues]
+            stats.generation_time += perf_counter() - start
+
+    def _enqueue(self, axis, i):
+        if not self.queued[axis][i]:
+            self.queued[axis][i] = True
+            self.queue.append((axis, i))
+
+    def _clear_queue(self):
+        for axis, i in self.queue:
+            self.queued[axis][i] = False
+        self.queue.clear()
+
+    def _set_line(self, axis, i, filled, empty):
+        """Stores new masks for a line and pushes the newly known cells into the crossing lines."""
+        old_filled, old_empty = self.filled[axis][i], self.empty[axis][i]
+        self.trail.append((axis, i, old_filled, old_empty))
+        self.filled[axis][i], self.empty[axis][i] = filled, empty
+
+        cross = 1 - axis
+        bit = 1 << i
+        for masks, new_cells in ((self.filled[cross], filled & ~old_filled), (self.empty[cross], empty & ~old_empty)):
+            while new_cells:
+                low = new_cells & -new_cells
+                j = low.bit_length() - 1
+                new_cells ^= low
+                self.trail.append((cross, j, self.filled[cross][j], self.empty[cross][j]))
+                masks[j] |= bit
+                self._enqueue(cross, j)
+
+    def _undo(self, mark):
+        trail = self.trail
+        while len(trail) > mark:
+            axis, i, filled, empty = trail.pop()
+            self.filled[axis][i], self.empty[axis][i] = filled, empty
+
+    def propagate(self):
+        """Solves queued lines until nothing new is learned. Returns False on a contradiction."""
+        start = perf_counter() if self.stats is not None else 0
+        solved_lines = 0
+        consistent = True
+        while self.queue:
+            axis, i = self.queue.popleft()
+            self.queued[axis][i] = False
+            solved_lines += 1
+            solved = self.lines[axis][i].solve(self.filled[axis][i], self.empty[axis][i])
+            if solved is None:
+                self._clear_queue()
+                consistent = False # Contradiction
                 break
-        
-        # --- 3. Guessing (Backtracking) ---
-        # If we are here, propagation stalled but puzzle isn't solved.
-        # Find the row with the fewest possibilities (> 1) to minimize branching factor.
+            if solved != (self.filled[axis][i], self.empty[axis][i]):
+                self._set_line(axis, i, *solved)
+
+        if self.stats is not None:
+            self.stats.propagation_rounds += 1
+            self.stats.lines_solved += solved_lines
+            self.stats.propagation_time += perf_counter() - start
+        return consistent
+
+    def _solution(self):
+        """Returns the grid tuple if every cell of every row is known, else None."""
+        n_cols = self.lengths[ROWS]
+        full_row = (1 << n_cols) - 1
+        rows_filled, rows_empty = self.filled[ROWS], self.empty[ROWS]
+        if all(f | e == full_row for f, e in zip(rows_filled, rows_empty)):
+            return tuple(
+                tuple((f >> c) & 1 for c in range(n_cols))
+                for f in rows_filled
+            )
+        return None
+
+    def _guesses(self):
+        """
+        Yields every placement of the row with the fewest remaining placements (> 1),
+        each one forced onto the grid; the state is rolled back before the next one.
+        """
+        start = perf_counter() if self.stats is not None else 0
+        row_clues = self.clues[ROWS]
+        rows_filled, rows_empty = self.filled[ROWS], self.empty[ROWS]
+        n_cols = self.lengths[ROWS]
+        full_row = (1 << n_cols) - 1
+
+        # Find the row with the fewest remaining placements (> 1) to minimize branching factor.
         min_len = float('inf')
         best_r = -1
-        
-        for r in range(n_rows):
-            l = len(r_poss[r])
+
+        for r in range(len(row_clues)):
+            if rows_filled[r] | rows_empty[r] == full_row:
+                continue
+            l = _count_placements(n_cols, row_clues[r], rows_filled[r], rows_empty[r])[0][0]
             if 1 < l < min_len:
                 min_len = l
                 best_r = r
-        
-        if best_r == -1: return None # Should not happen if logic is correct
-        
-        # Try each possibility for this row
-        for hypothesis in r_poss[best_r]:
-            # Create deep copies of possibilities to pass to recursive step
-            new_r_poss = list(r_poss)
-            new_c_poss = list(c_poss)
-            
-            # Force the hypothesis
-            new_r_poss[best_r] = [hypothesis]
-            
-            result = search(new_r_poss, new_c_poss)
+
+        if self.stats is not None:
+            self.stats.guessing_time += perf_counter() - start
+        if best_r == -1: return # Should not happen if logic is correct
+
+        # Placements are generated lazily from the state before the guess
+        mark = len(self.trail)
+        self.depth += 1
+        for hypothesis in _iter_placements(n_cols, row_clues[best_r], rows_filled[best_r], rows_empty[best_r]):
+            if self.stats is not None:
+                self.stats.branch_nodes += 1
+                self.stats.max_depth = max(self.stats.max_depth, self.depth)
+            if self.on_guess is not None:
+                self.on_guess(self.depth, best_r, tuple((hypothesis >> c) & 1 for c in range(n_cols)))
+
+            # Force the hypothesis, only the crossing columns need to be revisited
+            self._set_line(ROWS, best_r, hypothesis, full_row & ~hypothesis)
+            yield hypothesis
+            self._undo(mark)
+        self.depth -= 1
+
+    def search(self):
+        if _cancelled is not None and _cancelled.is_set():
+            return None
+        if not self.propagate():
+            return None
+
+        solution = self._solution()
+        if solution is not None:
+            return solution
+
+        # --- Guessing (Backtracking) ---
+        # If we are here, propagation stalled but puzzle isn't solved.
+        for _ in self._guesses():
+            result = self.search()
             if result is not None:
                 return result
-                
+
+        return None
+
+    def branches(self, depth):
+        """Yields (rows_filled, rows_empty) snapshots of every open sub-problem `depth` guesses down."""
+        if not self.propagate():
+            return
+        if depth <= 0 or self._solution() is not None:
+            yield list(self.filled[ROWS]), list(self.empty[ROWS])
+            return
+        for _ in self._guesses():
+            yield from self.branches(depth - 1)
+
+
+# --- Helper Functions ---
+
+class _LineData:
+    """Clue data of one (length, clues) line plus the line states already solved for it."""
+
+    def __init__(self, length, line_clues):
+        self.length = length
+        self.clues = tuple(c for c in line_clues if c)
+        self.results = {}
+
+    def solve(self, filled, empty):
+        key = (filled, empty)
+        if key in self.results:
+            return self.results[key]
+        # Line states repeat a lot across branches and puzzles
+        if len(self.results) >= LINE_CACHE_SIZE:
+            self.results.clear()
+        solved = self.results[key] = _solve_line(self.length, self.clues, filled, empty)
+        return solved
+
+
+@lru_cache(maxsize=LINE_DATA_CACHE_SIZE)
+def _compile_line(length, line_clues):
+    return _LineData(length, line_clues)
+
+
+def _solve_line(length, line_clues, filled, empty):
+    """
+    Derives every forced cell of a line from its clues and its partial state
+    (filled/empty bitmasks), without enumerating the placements.
+    Returns the refined (filled, empty) pair, or None if the line is contradictory.
+
+    fwd[j][i] is True when the first j blocks fit in cells [0, i) and
+    bwd[j][i] is True when blocks j.. fit in cells [i, length); a block j
+    starting at s is then valid when both sides around it fit.
+    """
+    line_clues = [c for c in line_clues if c]
+    k = len(line_clues)
+
+    # is_filled[i]: cell i is known to be 1, empties[i]: known 0s in cells [0, i)
+    is_filled = [(filled >> i) & 1 for i in range(length)] + [0]
+    empties = [0] * (length + 1)
+    for i in range(length):
+        empties[i + 1] = empties[i] + ((empty >> i) & 1)
+
+    fwd = [[False] * (length + 1) for _ in range(k + 1)]
+    fwd[0][0] = True
+    for i in range(1, length + 1):
+        fwd[0][i] = fwd[0][i - 1] and not is_filled[i - 1]
+    for j in range(1, k + 1):
+        block_len = line_clues[j - 1]
+        row, prev = fwd[j], fwd[j - 1]
+        for i in range(block_len, length + 1):
+            # Cell i - 1 is a gap, or block j - 1 ends exactly at i
+            if row[i - 1] and not is_filled[i - 1]:
+                row[i] = True
+                continue
+            start = i - block_len
+            if empties[i] != empties[start]:
+                continue
+            if j == 1:
+                row[i] = prev[start]
+            else:
+                row[i] = start > 0 and prev[start - 1] and not is_filled[start - 1]
+
+    if not fwd[k][length]:
+        return None
+
+    bwd = [[False] * (length + 1) for _ in range(k + 1)]
+    bwd[k][length] = True
+    for i in range(length - 1, -1, -1):
+        bwd[k][i] = bwd[k][i + 1] and not is_filled[i]
+    for j in range(k - 1, -1, -1):
+        block_len = line_clues[j]
+        row, nxt = bwd[j], bwd[j + 1]
+        for i in range(length - block_len, -1, -1):
+            # Cell i is a gap, or block j starts exactly at i
+            if row[i + 1] and not is_filled[i]:
+                row[i] = True
+                continue
+            end = i + block_len
+            if empties[end] != empties[i]:
+                continue
+            if j == k - 1:
+                row[i] = nxt[end]
+            else:
+                row[i] = end < length and nxt[end + 1] and not is_filled[end]
+
+    can_fill = 0
+    can_empty = 0
+
+    # A cell can be a gap if some split of the blocks leaves it uncovered
+    for j in range(k + 1):
+        before, after = fwd[j], bwd[j]
+        for i in range(length):
+            if before[i] and after[i + 1] and not is_filled[i]:
+                can_empty |= 1 << i
+
+    # A cell can be filled if some valid placement of a block covers it
+    for j, block_len in enumerate(line_clues):
+        block = (1 << block_len) - 1
+        before = fwd[j]
+        after = bwd[j + 1] + [j == k - 1]
+        for start in range(length - block_len + 1):
+            end = start + block_len
+            if empties[end] != empties[start] or is_filled[end]:
+                continue
+            if j == 0:
+                fits_before = before[start]
+            else:
+                fits_before = start > 0 and before[start - 1] and not is_filled[start - 1]
+            # after[end + 1] covers both the separator gap and the end of the line
+            if fits_before and after[end + 1]:
+                can_fill |= block << start
+
+    full = (1 << length) - 1
+    new_filled = full & ~can_empty
+    new_empty = full & ~can_fill
+    if new_filled & new_empty:
         return None
+    return new_filled, new_empty
+
+
+def _count_placements(length, line_clues, filled, empty):
+    """
+    ways[j][i] is the number of placements of blocks j.. within cells [i, length)
+    that agree with the partial state of the line.
+    """
+    line_clues = [c for c in line_clues if c]
+    k = len(line_clues)
+    is_filled = [(filled >> i) & 1 for i in range(length)] + [0]
+    empties = [0] * (length + 1)
+    for i in range(length):
+        empties[i + 1] = empties[i] + ((empty >> i) & 1)
+
+    ways = [[0] * (length + 2) for _ in range(k + 1)]
+    ways[k][length] = 1
+    for i in range(length - 1, -1, -1):
+        ways[k][i] = 0 if is_filled[i] else ways[k][i + 1]
+    for j in range(k - 1, -1, -1):
+        block_len = line_clues[j]
+        row, nxt = ways[j], ways[j + 1]
+        for i in range(length - block_len, -1, -1):
+            # Cell i is a gap, or block j starts exactly at i
+            total = 0 if is_filled[i] else row[i + 1]
+            end = i + block_len
+            if empties[end] == empties[i]:
+                if j == k - 1:
+                    total += nxt[end]
+                elif end < length and not is_filled[end]:
+                    total += nxt[end + 1]
+            row[i] = total
+    return ways
+
+
+def _iter_placements(length, line_clues, filled, empty):
+    """Lazily yields the filled mask of every placement that agrees with the partial line."""
+    ways = _count_placements(length, line_clues, filled, empty)
+    line_clues = [c for c in line_clues if c]
+    k = len(line_clues)
+
+    def place(j, index, mask):
+        if j == k:
+            yield mask
+            return
+        block_len = line_clues[j]
+        for start in range(index, length - block_len + 1):
+            # Every cell skipped before the block is a gap
+            if start > index and (filled >> (start - 1)) & 1:
+                break
+            end = start + block_len
+            if (empty >> start) & ((1 << block_len) - 1):
+                continue
+            if j == k - 1:
+                if ways[k][end]:
+                    yield mask | (((1 << block_len) - 1) << start)
+            elif end < length and not (filled >> end) & 1 and ways[j + 1][end + 1]:
+                yield from place(j + 1, end + 1, mask | (((1 << block_len) - 1) << start))
 
-    return search(rows_possibilities, cols_possibilities)
\ No newline at end of file
+    # Nothing fits, e.g. a line without blocks that already has a filled cell
+    if not ways[0][0]:
+        return iter(())
+    return place(0, 0, 0)
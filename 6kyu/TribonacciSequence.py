@@ -1,10 +1,128 @@
+from collections import deque
+from itertools import islice
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+INT64_MAX = 2 ** 63 - 1
+
+
 def tribonacci(signature, n):
-    if n == 0:
-        return []
-    elif n <= 3:
-        return signature[:n]
+    return kbonacci(signature[:3], n)
+
+
+def tribonacci_term(signature, n, mod=None):
+    return kbonacci_term(signature[:3], n, mod)
+
+
+def tribonacci_many(signatures, n, last_only=False):
+    """
+    Evaluates tribonacci(signature, n) for every row of an (N, 3) array of signatures at once.
+
+    Returns the (N, n) matrix of terms, or only its last column with last_only=True.
+    Integer signatures use int64 when the largest possible term fits, exact Python ints
+    (object dtype) otherwise; float signatures use float64. Without NumPy, plain lists.
+    """
+    if last_only and n < 1:
+        raise ValueError('last_only needs n >= 1')
+    if np is None:
+        rows = [tribonacci(list(signature), n) for signature in signatures]
+        return [row[-1] for row in rows] if last_only else rows
+
+    signatures = np.asarray(signatures)
+    if signatures.ndim != 2 or signatures.shape[1] != 3:
+        raise ValueError('signatures must be an (N, 3) array, got shape %s' % (signatures.shape,))
+    if signatures.dtype.kind == 'f':
+        dtype = float
     else:
-        while len(signature) < n:
-            next_value = signature[-1] + signature[-2] + signature[-3]
-            signature.append(next_value)
-        return signature
\ No newline at end of file
+        # |term i| <= max|signature| * term i of [1, 1, 1], which bounds the whole batch
+        if not signatures.size:
+            largest = 0
+        elif signatures.dtype.kind in 'iu':
+            largest = max(int(signatures.max()), -int(signatures.min()))
+        else:
+            largest = max(abs(int(x)) for x in signatures.flat)
+        dtype = np.int64 if _fits_int64(largest, n) else object
+    signatures = signatures.astype(dtype)
+
+    if last_only:
+        # Only three rolling columns are kept alive
+        if n <= 3:
+            return signatures[:, n - 1].copy()
+        a, b, c = signatures[:, 0], signatures[:, 1], signatures[:, 2]
+        for _ in range(n - 3):
+            a, b, c = b, c, a + b + c
+        return c
+
+    # Column-major, so that every term column is contiguous
+    result = np.empty((len(signatures), n), dtype=dtype, order='F')
+    result[:, :min(n, 3)] = signatures[:, :n]
+    for i in range(3, n):
+        np.add(result[:, i - 1], result[:, i - 2], out=result[:, i])
+        result[:, i] += result[:, i - 3]
+    return result
+
+
+def _fits_int64(largest, n):
+    """Whether largest times each of the first n terms of [1, 1, 1] stays within int64."""
+    if not largest:
+        return True
+    limit = INT64_MAX // largest
+    # The terms grow geometrically, so this stops after a few dozen steps at most
+    a, b, c = 1, 1, 1
+    for _ in range(n - 3):
+        if c > limit:
+            return False
+        a, b, c = b, c, a + b + c
+    return c <= limit
+
+
+def kbonacci(signature, n):
+    """First n terms of the sequence where every term is the sum of the previous len(signature)."""
+    return list(islice(iter_kbonacci(signature), n))
+
+
+def iter_kbonacci(signature):
+    """Lazily yields the terms, keeping only the last len(signature) of them."""
+    yield from signature
+    if not signature:
+        return
+    window = deque(signature, maxlen=len(signature))
+    while True:
+        next_value = sum(reversed(window))
+        window.append(next_value)
+        yield next_value
+
+
+def kbonacci_term(signature, n, mod=None):
+    """
+    Term n (0-based) in O(k^3 log n) via fast exponentiation of the k x k companion matrix,
+    optionally reduced modulo `mod` at every step.
+    """
+    k = len(signature)
+    if n < k:
+        return signature[n] % mod if mod else signature[n]
+
+    def reduce(x):
+        return x % mod if mod else x
+
+    def mat_mul(a, b):
+        return [
+            [reduce(sum(a[i][t] * b[t][j] for t in range(k))) for j in range(k)]
+            for i in range(k)
+        ]
+
+    # Row i < k - 1 shifts the window, the last row sums it
+    step = [[int(j == i + 1) for j in range(k)] for i in range(k - 1)] + [[1] * k]
+    power = [[int(i == j) for j in range(k)] for i in range(k)]
+    exponent = n - k + 1
+    while exponent:
+        if exponent & 1:
+            power = mat_mul(power, step)
+        step = mat_mul(step, step)
+        exponent >>= 1
+
+    # power maps (a_0 .. a_{k-1}) to (a_{n-k+1} .. a_n)
+    return reduce(sum(c * s for c, s in zip(power[-1], signature)))
@@ -1,7 +1,63 @@
-def is_square(n):    
+from math import isqrt
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Quadratic residues: n can only be a square if n % m is one of these for every m
+_QR64 = [False] * 64
+_QR63 = [False] * 63
+_QR65 = [False] * 65
+_QR11 = [False] * 11
+for _i in range(65):
+    for _table in (_QR64, _QR63, _QR65, _QR11):
+        _table[_i * _i % len(_table)] = True
+del _i, _table
+
+
+def is_square(n):
     if n < 0:
         return False
-    i = 0
-    while i * i < n:
-        i += 1
-    return i * i == n
\ No newline at end of file
+    # Cheap residue filters reject most non-squares before the exact square root
+    if not _QR64[n & 63]:
+        return False
+    r = n % 45045 # 63 * 65 * 11
+    if not (_QR63[r % 63] and _QR65[r % 65] and _QR11[r % 11]):
+        return False
+    i = isqrt(n)
+    return i * i == n
+
+
+def is_square_many(values):
+    """
+    Classifies a NumPy array or iterable of ints in bulk; returns a boolean array
+    (a list without NumPy). Exact for the whole int64/uint64 range, larger values
+    go through is_square one by one.
+    """
+    if np is None:
+        return [is_square(n) for n in values]
+
+    arr = np.asarray(values)
+    if arr.dtype.kind in 'fc':
+        raise TypeError('is_square_many needs integers, got {} values'.format(arr.dtype))
+    if arr.dtype.kind not in 'iu':
+        # Not converted with int(), which would truncate: is_square rejects non-integers itself
+        return np.array([is_square(n) for n in arr.flat], dtype=bool).reshape(arr.shape)
+
+    # Work on a flat view so that 0-d input is indexed like any other shape
+    shape, arr = arr.shape, arr.reshape(-1)
+    result = arr >= 0
+    result &= np.array(_QR64)[arr & 63]
+    r = arr[result] % 45045
+    passed = np.array(_QR63)[r % 63] & np.array(_QR65)[r % 65] & np.array(_QR11)[r % 11]
+    result[result] = passed
+
+    # Float square root is only approximate beyond 2**53, so test its neighbours exactly
+    candidates = arr[result].astype(np.uint64)
+    root = np.rint(np.sqrt(candidates.astype(np.float64))).astype(np.uint64)
+    found = np.zeros(len(candidates), dtype=bool)
+    for guess in (root - 1, root, root + 1):
+        found |= guess * guess == candidates
+    result[result] = found
+    return result.reshape(shape)